@@ -8,6 +8,15 @@ from .matcher import AutoCategoryMatcher
 from .tester import SpeedTester
 from .exporter import ResultExporter
 from .models import Channel
+from .health import HostHealthTracker
+from .resolver import CachedResolver
+from .service import IPTVService
+from .ipindex import AddressFamilyIndex
+from .checkpoint import CheckpointStore, shard_of
+from .reporting import StageProgress, setup_logging
+from .artifacts import CompiledConfig, load_compiled_config
+from .hls import HLSSampler
+from .policy import UrlPolicy
 
 # 如果需要，可以在这里定义其他模块级别的变量或常量
 __all__ = [
@@ -17,4 +26,16 @@ __all__ = [
     'SpeedTester',
     'ResultExporter',
     'Channel',
+    'HostHealthTracker',
+    'CachedResolver',
+    'IPTVService',
+    'AddressFamilyIndex',
+    'CheckpointStore',
+    'shard_of',
+    'StageProgress',
+    'setup_logging',
+    'CompiledConfig',
+    'load_compiled_config',
+    'HLSSampler',
+    'UrlPolicy',
 ]
\ No newline at end of file
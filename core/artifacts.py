@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import logging
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# 产物格式版本号，修改 CompiledConfig 结构或产物格式时需要递增
+ARTIFACT_VERSION = 4
+
+# 含有这些字符的模板规则按正则处理，其余按普通字符串处理
+REGEX_METACHARS = frozenset('.^$*+?{}[]\\()|')
+
+# 模板中的 "频道名称,URL" 行，逗号前为频道名称
+NAME_URL_REGEX = re.compile(r'^([^,]+),\s*[a-zA-Z][\w+.-]*:')
+
+@dataclass
+class CompiledConfig:
+    """模板、黑名单和白名单的预编译结果"""
+    # 结构: [(分类名称, [字符串规则], [正则规则源码]), ...]，保持模板中的分类顺序
+    rules: List[Tuple[str, List[str], List[str]]] = field(default_factory=list)
+    # 结构: {频道名称: 标准名称}
+    name_mapping: Dict[str, str] = field(default_factory=dict)
+    # 结构: [[标准名称, 别名, ...], ...]，包含不含正则元字符的模板行，以及 "频道名称,URL" 行中的普通频道名称
+    alias_groups: List[List[str]] = field(default_factory=list)
+    # 模板中出现的所有普通频道名称，规范化时命中这些名称不再做模糊查找
+    literal_names: List[str] = field(default_factory=list)
+    # 结构: {分类名称: [频道名称列表]}
+    template_order: Dict[str, List[str]] = field(default_factory=dict)
+    # 结构: {分类名称: {字符串频道名称: 首次出现的顺序}}
+    order_index: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # 结构: {分类名称: [(顺序, 正则频道名称), ...]}
+    order_regex: Dict[str, List[Tuple[int, str]]] = field(default_factory=dict)
+    blacklist: List[str] = field(default_factory=list)
+    whitelist: List[str] = field(default_factory=list)
+
+
+def is_literal(rule: str) -> bool:
+    """检查模板规则是否不含正则元字符"""
+    return not any(ch in REGEX_METACHARS for ch in rule)
+
+
+def read_list_file(path: Path) -> List[str]:
+    """读取黑名单/白名单文件，跳过空行和注释行，保持原始顺序并去重"""
+    if not path.exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    return list(dict.fromkeys(entries))
+
+
+def compile_templates(template_path: Path, compiled: CompiledConfig):
+    """
+    单次遍历模板文件，生成分类规则、名称映射和排序索引。
+
+    :param template_path: 模板文件路径。
+    :param compiled: 写入结果的 CompiledConfig 对象。
+    """
+    current_category = None
+    rules: Dict[str, Tuple[List[str], List[str]]] = {}
+    literal_names = set()
+    with open(template_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue  # 跳过空行和注释行
+
+            # 检查是否为分类行
+            if line.endswith(',#genre#'):
+                current_category = line.split(',')[0]
+                rules[current_category] = ([], [])
+                compiled.template_order[current_category] = []
+                compiled.order_index[current_category] = {}
+                compiled.order_regex[current_category] = []
+                continue
+
+            # 名称映射和别名组：第一个名称作为标准名称
+            parts = line.split('|')
+            if len(parts) > 1:
+                for name in parts:
+                    compiled.name_mapping[name] = parts[0]
+            literal_line = all(is_literal(part) for part in parts)
+            if literal_line:
+                compiled.alias_groups.append(parts)
+                literal_names.update(part.strip() for part in parts)
+            else:
+                # "频道名称,URL" 行整行含有正则元字符，只取逗号前的普通名称加入别名表
+                match = NAME_URL_REGEX.match(line)
+                if match and is_literal(match.group(1).strip()):
+                    name = match.group(1).strip()
+                    compiled.alias_groups.append([name])
+                    literal_names.add(name)
+
+            if not current_category:
+                continue
+
+            # 分类规则：整行不含正则元字符（或仅以 | 分隔多个普通名称）时按字符串包含匹配
+            literals, regexes = rules[current_category]
+            if literal_line:
+                literals.extend(parts)
+            else:
+                try:
+                    re.compile(line)
+                    regexes.append(line)
+                except re.error as e:
+                    logging.error(f"正则表达式编译失败: {line} ({str(e)})")
+
+            # 排序索引：普通名称直接按名称查找，其余名称保留为正则
+            order = compiled.template_order[current_category]
+            for name in parts:
+                name = name.strip()
+                if is_literal(name):
+                    compiled.order_index[current_category].setdefault(name, len(order))
+                else:
+                    compiled.order_regex[current_category].append((len(order), name))
+                order.append(name)
+
+    compiled.rules = [(category, literals, regexes) for category, (literals, regexes) in rules.items()]
+    compiled.literal_names = sorted(literal_names)
+
+
+def _file_hash(path: Path) -> str:
+    """计算文件内容的 SHA-256，文件不存在时返回空字符串"""
+    if not path.exists():
+        return ''
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _from_dict(data: dict) -> CompiledConfig:
+    """由产物中的 JSON 数据还原 CompiledConfig（JSON 中的元组会变成列表）"""
+    return CompiledConfig(
+        rules=[(category, literals, regexes) for category, literals, regexes in data['rules']],
+        name_mapping=data['name_mapping'],
+        alias_groups=data['alias_groups'],
+        literal_names=data['literal_names'],
+        template_order=data['template_order'],
+        order_index=data['order_index'],
+        order_regex={category: [(i, name) for i, name in items] for category, items in data['order_regex'].items()},
+        blacklist=data['blacklist'],
+        whitelist=data['whitelist'],
+    )
+
+
+def load_compiled_config(template_path: str, blacklist_path: str, whitelist_path: str,
+                         artifact_path: Optional[str] = None) -> CompiledConfig:
+    """
+    加载预编译产物，源文件有变化或产物不存在时重新编译并写入。
+
+    产物使用 JSON 格式，只包含普通列表和字典，加载时不会执行任何代码。
+
+    :param template_path: 模板文件路径。
+    :param blacklist_path: 黑名单文件路径。
+    :param whitelist_path: 白名单文件路径。
+    :param artifact_path: 产物文件路径，为空时只编译不缓存。
+    :return: 预编译结果。
+    """
+    sources = [Path(template_path), Path(blacklist_path), Path(whitelist_path)]
+    key = [ARTIFACT_VERSION] + [_file_hash(p) for p in sources]
+
+    artifact = Path(artifact_path) if artifact_path else None
+    if artifact and artifact.exists():
+        try:
+            with open(artifact, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('key') == key:
+                logging.info(f"已加载预编译产物: {artifact}")
+                return _from_dict(data['config'])
+        except Exception as e:
+            logging.warning(f"预编译产物加载失败，将重新编译: {artifact} ({str(e)})")
+
+    compiled = CompiledConfig()
+    compile_templates(sources[0], compiled)
+    compiled.blacklist = read_list_file(sources[1])
+    compiled.whitelist = read_list_file(sources[2])
+
+    if artifact:
+        artifact.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = artifact.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': key, 'config': asdict(compiled)}, f, ensure_ascii=False)
+        tmp_path.replace(artifact)
+        logging.info(f"📝 预编译产物已写入: {artifact}")
+    return compiled
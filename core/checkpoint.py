@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+import gzip
+import json
+import logging
+import os
+import zlib
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .models import Channel
+
+# 测速结果中需要保存的字段
+RESULT_FIELDS = ('status', 'response_time', 'download_speed', 'realtime_factor', 'bitrate')
+
+
+def shard_of(url: str, shard_count: int) -> int:
+    """按 URL 的 CRC32 计算所属分片，结果与运行环境无关"""
+    return zlib.crc32(url.encode('utf-8')) % shard_count
+
+
+class ResultWriter:
+    """测速结果追加写入器，按批次刷新到磁盘"""
+
+    def __init__(self, path: Path, flush_every: int = 200):
+        """
+        初始化结果写入器。
+
+        :param path: 结果文件路径（JSON Lines，追加写入）。
+        :param flush_every: 每累计多少条结果刷新一次。
+        """
+        self.path = path
+        self.flush_every = max(flush_every, 1)
+        self._buffer: List[str] = []
+        # 上次运行中断时最后一行可能不完整，先补换行避免与新记录粘连
+        truncated = False
+        if path.exists() and path.stat().st_size:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                truncated = f.read(1) != b'\n'
+        self._file = open(path, 'a', encoding='utf-8')
+        if truncated:
+            self._file.write('\n')
+
+    def record(self, channel: Channel):
+        """记录一个频道的测速结果"""
+        result = {'url': channel.url}
+        result.update({name: getattr(channel, name) for name in RESULT_FIELDS})
+        self._buffer.append(json.dumps(result, ensure_ascii=False))
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """将缓冲的结果写入磁盘"""
+        if self._buffer:
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self._buffer = []
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        """刷新并关闭文件"""
+        self.flush()
+        self._file.close()
+
+
+class CheckpointStore:
+    """流水线检查点：保存各阶段的频道列表和测速中间结果，用于中断后恢复及分片合并"""
+
+    def __init__(self, directory: str, flush_every: int = 200):
+        """
+        初始化检查点存储。
+
+        :param directory: 检查点目录。
+        :param flush_every: 测速结果每累计多少条刷新一次。
+        """
+        self.directory = Path(directory)
+        self.flush_every = flush_every
+        self.logger = logging.getLogger(__name__)
+
+    def _stage_path(self, stage: str) -> Path:
+        return self.directory / f"{stage}.jsonl.gz"
+
+    def save_channels(self, stage: str, channels: List[Channel]):
+        """
+        保存阶段结果。先写临时文件再原子替换，文件存在即表示该阶段已完成。
+
+        :param stage: 阶段名称。
+        :param channels: 频道列表。
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._stage_path(stage)
+        tmp_path = path.with_suffix('.tmp')
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=5) as f:
+            for chan in channels:
+                f.write(json.dumps(asdict(chan), ensure_ascii=False) + '\n')
+        os.replace(tmp_path, path)
+        self.logger.info(f"📝 检查点已保存: {stage} ({len(channels)} 个频道)")
+
+    def load_channels(self, stage: str) -> Optional[List[Channel]]:
+        """
+        加载阶段结果。
+
+        :param stage: 阶段名称。
+        :return: 频道列表，检查点不存在时返回 None。
+        """
+        path = self._stage_path(stage)
+        if not path.exists():
+            return None
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            channels = [Channel(**json.loads(line)) for line in f if line.strip()]
+        self.logger.info(f"已从检查点恢复: {stage} ({len(channels)} 个频道)")
+        return channels
+
+    def _results_path(self, shard: Optional[int] = None) -> Path:
+        name = f"results_shard{shard}.jsonl" if shard is not None else "results.jsonl"
+        return self.directory / name
+
+    def result_writer(self, shard: Optional[int] = None) -> ResultWriter:
+        """创建测速结果写入器，分片运行时每个分片写入独立文件"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        return ResultWriter(self._results_path(shard), self.flush_every)
+
+    def save_shard_count(self, shard_count: int):
+        """
+        记录分片总数，供合并时检查各分片结果是否齐全。
+
+        :param shard_count: 分片总数。
+        :raises ValueError: 检查点目录中已有按其他分片数运行的结果。
+        """
+        path = self.directory / 'shards.json'
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                recorded = json.load(f).get('count')
+            if recorded != shard_count:
+                raise ValueError(f"❌ 检查点目录中已有按 {recorded} 个分片运行的结果，请先清理: {self.directory}")
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'count': shard_count}, f)
+
+    def missing_shards(self) -> List[int]:
+        """
+        检查各分片的结果文件是否齐全。
+
+        :return: 缺少结果文件的分片序号，未按分片运行时返回空列表。
+        """
+        path = self.directory / 'shards.json'
+        if not path.exists():
+            return []
+        with open(path, 'r', encoding='utf-8') as f:
+            shard_count = json.load(f)['count']
+        return [i for i in range(shard_count) if not self._results_path(i).exists()]
+
+    def clear_results(self, shard: Optional[int] = None):
+        """删除指定分片的测速结果，不影响其他分片"""
+        path = self._results_path(shard)
+        if path.exists():
+            path.unlink()
+
+    def load_results(self) -> Dict[str, dict]:
+        """
+        加载所有测速结果文件（包括各分片）。
+
+        :return: 结构: {URL: {字段: 值}}，同一 URL 以最后写入的结果为准。
+        """
+        results = {}
+        for path in sorted(self.directory.glob('results*.jsonl')):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 进程中断时最后一行可能不完整
+                    results[record.pop('url')] = record
+        if results:
+            self.logger.info(f"已从检查点恢复测速结果: {len(results)} 个 URL")
+        return results
+
+    @staticmethod
+    def apply_result(channel: Channel, result: dict):
+        """将保存的测速结果写回频道对象"""
+        for name in RESULT_FIELDS:
+            if name in result:
+                setattr(channel, name, result[name])
+
+    def clear(self):
+        """删除所有检查点文件"""
+        if not self.directory.exists():
+            return
+        for path in self.directory.iterdir():
+            if path.suffix in ('.gz', '.jsonl', '.json', '.tmp'):
+                path.unlink()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+import codecs
+import zlib
+from functools import lru_cache
+from typing import List, Optional
+
+# 编码探测使用的前缀长度（字节）
+SAMPLE_SIZE = 64 * 1024
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _is_valid(sample: bytes, encoding: str) -> bool:
+    """检查前缀样本能否按指定编码解码（末尾被截断的多字节字符不视为错误）"""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+        return True
+    except (UnicodeDecodeError, LookupError):
+        return False
+
+
+@lru_cache(maxsize=64)
+def _is_single_byte(encoding: str) -> bool:
+    """
+    检查是否为单字节编码（如 ISO-8859-1、cp1252）。单字节编码能解码任意字节，
+    按它校验总能通过，不能作为判断依据；多字节编码遇到前导字节时会等待后续字节。
+    """
+    try:
+        factory = codecs.getincrementaldecoder(encoding)
+    except LookupError:
+        return False
+    return all(len(factory(errors='replace').decode(bytes([b]), final=False)) == 1 for b in range(0x80, 0x100))
+
+
+def detect_encoding(sample: bytes, declared: Optional[str] = None) -> str:
+    """
+    根据内容前缀探测编码，依次检查 BOM、响应头声明的多字节编码、UTF-8 有效性、GBK 特征和声明的单字节编码。
+
+    服务器常把 ISO-8859-1 作为默认编码声明，因此声明的单字节编码只在内容既不是 UTF-8 也不是 GBK 时采用。
+
+    :param sample: 内容前缀。
+    :param declared: 响应头 Content-Type 中声明的编码。
+    :return: 编码名称，无法识别时返回 latin-1。
+    """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if declared and not _is_single_byte(declared) and _is_valid(sample, declared):
+        return declared
+    if _is_valid(sample, 'utf-8'):
+        return 'utf-8'
+    if _is_valid(sample, 'gb18030'):
+        return 'gb18030'  # GBK 的超集
+    if declared and _is_valid(sample, declared):
+        return declared
+    return 'latin-1'
+
+
+class StreamDecoder:
+    """流式解码器：按块接收响应体，探测编码后增量解码，不保留原始字节"""
+
+    def __init__(self, declared: Optional[str] = None):
+        """
+        初始化流式解码器。
+
+        :param declared: 响应头中声明的编码。
+        """
+        self.declared = declared
+        self.encoding: Optional[str] = None
+        self.size = 0
+        self._pending = bytearray()  # 探测编码前缓存的前缀
+        self._inflater = None
+        self._decoder = None
+        self._parts: List[str] = []
+        self._first_chunk = True
+
+    def _decompress(self, chunk: bytes) -> bytes:
+        """未声明 Content-Encoding 的 gzip 文件（如 .m3u.gz）按块解压"""
+        if self._first_chunk:
+            self._first_chunk = False
+            if chunk.startswith(GZIP_MAGIC):
+                self._inflater = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        if self._inflater is not None:
+            return self._inflater.decompress(chunk)
+        return chunk
+
+    def _start(self, sample: bytes):
+        """根据前缀确定编码并创建增量解码器"""
+        self.encoding = detect_encoding(sample, self.declared)
+        self._decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+
+    def feed(self, chunk: bytes):
+        """输入一块响应体"""
+        self.size += len(chunk)
+        data = self._decompress(chunk)
+        if self._decoder is None:
+            self._pending += data
+            if len(self._pending) < SAMPLE_SIZE:
+                return
+            data = bytes(self._pending)
+            self._pending = bytearray()
+            self._start(data)
+        self._parts.append(self._decoder.decode(data))
+
+    def finish(self) -> str:
+        """结束输入并返回完整文本"""
+        if self._inflater is not None:
+            self._feed_tail(self._inflater.flush())
+        if self._decoder is None:
+            data = bytes(self._pending)
+            self._pending = bytearray()
+            self._start(data)
+            self._parts.append(self._decoder.decode(data))
+        self._parts.append(self._decoder.decode(b'', final=True))
+        content = ''.join(self._parts)
+        self._parts = []
+        return content
+
+    def _feed_tail(self, data: bytes):
+        """输入解压缓冲区中剩余的数据"""
+        if not data:
+            return
+        if self._decoder is None:
+            self._pending += data
+        else:
+            self._parts.append(self._decoder.decode(data))
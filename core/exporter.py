@@ -18,16 +18,9 @@ class ResultExporter:
     def _ensure_dirs(self):
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
-    def export(self, channels: List[Channel], progress_cb: Callable):
-        # 读取白名单
-        whitelist_path = Path(self.config.get('WHITELIST', 'whitelist_path', fallback='config/whitelist.txt'))
-        if whitelist_path.exists():
-            with open(whitelist_path, 'r', encoding='utf-8') as f:
-                whitelist = set(line.strip() for line in f if line.strip() and not line.startswith('#'))
-        else:
-            whitelist = set()
-
-        sorted_channels = self.matcher.sort_channels_by_template(channels, whitelist)
+    def export(self, channels: List[Channel], progress_cb: Callable, presorted: bool = False):
+        # 调用方已按模板排序时无需再次排序；白名单优先级已由 URL 策略写入频道对象
+        sorted_channels = channels if presorted else self.matcher.sort_channels_by_template(channels)
         
         # 严格从配置文件读取参数
         m3u_filename = self.config.get('EXPORTER', 'm3u_filename')
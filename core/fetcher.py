@@ -1,44 +1,77 @@
 #!/usr/bin/env python3
 import aiohttp
 import asyncio
-from typing import List, Callable
-from io import BytesIO
+import logging
+from typing import List, Callable, Optional
+from .resolver import CachedResolver
+from .decoder import StreamDecoder
+
+# 安装 brotli 后 aiohttp 可流式解压 br 编码的响应
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+# 流式读取响应体的块大小（字节）
+CHUNK_SIZE = 64 * 1024
 
 class SourceFetcher:
     """订阅源获取器"""
     
-    def __init__(self, timeout: float, concurrency: int, retries: int = 3):
+    def __init__(self, timeout: float, concurrency: int, retries: int = 3, resolver: Optional[CachedResolver] = None):
         """
         初始化订阅源获取器。
 
         :param timeout: 请求超时时间（秒）。
         :param concurrency: 并发请求数。
         :param retries: 请求失败时的重试次数。
+        :param resolver: 共享的 DNS 缓存解析器，为空时使用 aiohttp 默认解析器。
         """
         self.timeout = aiohttp.ClientTimeout(total=timeout)
         self.semaphore = asyncio.Semaphore(concurrency)  # 使用并发数初始化信号量
         self.retries = retries
+        self.resolver = resolver
+        self.logger = logging.getLogger(__name__)
+
+    def create_session(self) -> aiohttp.ClientSession:
+        """创建使用共享 DNS 缓存的会话，常驻服务模式下可在多次获取之间复用"""
+        connector = aiohttp.TCPConnector(resolver=self.resolver) if self.resolver else None
+        return aiohttp.ClientSession(timeout=self.timeout, connector=connector)
+
+    async def fetch_all(self, urls: List[str], progress_cb: Callable,
+                        session: Optional[aiohttp.ClientSession] = None) -> List[str]:
+        """批量获取订阅源，未传入会话时创建临时会话"""
+        if session is None:
+            async with self.create_session() as session:
+                return await self.fetch_all(urls, progress_cb, session)
+
+        # 预解析订阅源主机名，无法解析的订阅源直接跳过
+        unresolvable = set()
+        if self.resolver:
+            unresolvable = await self.resolver.prefetch(CachedResolver.hostname(url) for url in urls)
 
-    async def fetch_all(self, urls: List[str], progress_cb: Callable) -> List[str]:
-        """批量获取订阅源"""
-        async with aiohttp.ClientSession(timeout=self.timeout) as session:
-            tasks = [self._fetch_with_retry(session, url, progress_cb) for url in urls]
-            return await asyncio.gather(*tasks)
+        tasks = [self._fetch_with_retry(session, url, progress_cb, unresolvable) for url in urls]
+        return await asyncio.gather(*tasks)
 
-    async def _fetch_with_retry(self, session: aiohttp.ClientSession, url: str, progress_cb: Callable) -> str:
+    async def _fetch_with_retry(self, session: aiohttp.ClientSession, url: str, progress_cb: Callable, unresolvable=()) -> str:
         """带重试的单次请求处理"""
+        if CachedResolver.hostname(url) in unresolvable:
+            self.logger.error("❌ 域名无法解析，跳过: %s", url)
+            progress_cb()
+            return ""
         for attempt in range(self.retries):
             try:
                 result = await self._fetch(session, url, progress_cb)
                 if result:
-                    print(f"✅ 成功获取: {url}")  # 记录成功日志
+                    self.logger.info("✅ 成功获取: %s", url)
                 else:
-                    print(f"⚠️ 获取成功但内容为空: {url}")  # 记录内容为空的日志
+                    self.logger.warning("⚠️ 获取成功但内容为空: %s", url)
                 return result
             except Exception as e:
-                print(f"\n⚠️ 获取失败 (尝试 {attempt + 1}/{self.retries}): {url} ({str(e)})")
+                self.logger.warning("⚠️ 获取失败 (尝试 %d/%d): %s (%s)", attempt + 1, self.retries, url, e)
                 if attempt == self.retries - 1:
-                    print(f"❌ 最终失败: {url}")  # 记录最终失败日志
+                    self.logger.error("❌ 最终失败: %s", url)
                     return ""
                 await asyncio.sleep(1)  # 等待一段时间后重试
 
@@ -47,41 +80,21 @@ class SourceFetcher:
         async with self.semaphore:
             try:
                 headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
+                    'Accept-Encoding': ACCEPT_ENCODING}
                 async with session.get(url, headers=headers) as resp:
                     # 检查响应状态码
                     if resp.status != 200:
                         raise Exception(f"HTTP状态码: {resp.status}")
                     
-                    # 读取原始内容
-                    raw_content = await resp.read()
-                    if not raw_content:
+                    # 流式读取并增量解码，不同时保留原始字节和解码后的文本
+                    decoder = StreamDecoder(resp.charset)
+                    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                        decoder.feed(chunk)
+                    if not decoder.size:
                         raise Exception("响应体为空")
-                    
-                    # 根据响应头中的编码解码内容
-                    content_type = resp.headers.get('Content-Type', '')
-                    if 'charset=' in content_type:
-                        # 从 Content-Type 中提取编码
-                        encoding = content_type.split('charset=')[-1].strip().lower()
-                    else:
-                        # 默认使用 utf-8
-                        encoding = 'utf-8'
-                    
-                    # 解码内容
-                    try:
-                        content = raw_content.decode(encoding)
-                    except UnicodeDecodeError:
-                        # 如果解码失败，尝试其他常见编码
-                        encodings = ['utf-8', 'gbk', 'latin-1']
-                        for enc in encodings:
-                            try:
-                                content = raw_content.decode(enc)
-                                break
-                            except UnicodeDecodeError:
-                                continue
-                        else:
-                            raise Exception("无法解码响应内容")
-                    
+                    content = decoder.finish()
+
                     return content
             except Exception as e:
                 raise e
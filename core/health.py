@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+class HostHealthTracker:
+    """主机健康度统计，按 host:port 聚合连接失败与超时，对已判定宕机的主机快速失败"""
+
+    DEFAULT_PORTS = {'http': 80, 'https': 443, 'rtsp': 554, 'rtmp': 1935}
+
+    def __init__(self, failure_threshold: int = 3, sample_every: int = 20,
+                 half_life_hours: float = 24.0, state_path: Optional[str] = None):
+        """
+        初始化主机健康度统计。
+
+        :param failure_threshold: 主机被判定为宕机前允许的连接失败/超时次数。
+        :param sample_every: 主机宕机后，每隔多少个 URL 放行一个进行抽样探测（0 表示只放行每批测速的第一个 URL）。
+        :param half_life_hours: 失败次数的衰减半衰期（小时），宕机判定在最后一次失败后最多保持一个半衰期。
+        :param state_path: 状态持久化文件路径，为空时不持久化。
+        """
+        self.failure_threshold = max(failure_threshold, 1)
+        self.sample_every = max(sample_every, 0)
+        self.half_life = max(half_life_hours, 0.0) * 3600
+        self.state_path = Path(state_path) if state_path else None
+        self.failures: Dict[str, float] = {}  # 结构: {host:port: 最后一次失败时的失败次数（不超过 failure_threshold）}
+        self.last_failure: Dict[str, float] = {}  # 结构: {host:port: 最后一次失败的时间戳}
+        self.skipped: Dict[str, int] = {}  # 结构: {host:port: 本批测速遇到的宕机主机 URL 数}
+        self.fast_failed = 0
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def host_key(cls, url: str) -> str:
+        """
+        提取 URL 的 host:port 作为统计键。
+
+        :param url: 频道 URL。
+        :return: 小写的 host:port，无法解析时返回空字符串。
+        """
+        try:
+            parts = urlsplit(url)
+            host = parts.hostname
+            if not host:
+                return ''
+            port = parts.port or cls.DEFAULT_PORTS.get(parts.scheme.lower(), 0)
+        except ValueError:
+            return ''
+        if ':' in host:
+            host = f"[{host}]"  # IPv6 地址加方括号，避免与端口混淆
+        return f"{host}:{port}"
+
+    def _decayed(self, key: str, now: float) -> float:
+        """按距最后一次失败的时间衰减后的失败次数"""
+        count = self.failures.get(key, 0.0)
+        if not count or not self.half_life:
+            return count
+        return count * 0.5 ** (max(now - self.last_failure.get(key, now), 0) / self.half_life)
+
+    def _is_down(self, key: str, now: float) -> bool:
+        if self.failures.get(key, 0.0) < self.failure_threshold:
+            return False
+        # 失败次数封顶为阈值，衰减后立即低于阈值，因此宕机判定按时间保持一个半衰期后自动解除
+        return not self.half_life or now - self.last_failure.get(key, now) < self.half_life
+
+    def is_down(self, url: str) -> bool:
+        """检查 URL 所在主机是否已被判定为宕机"""
+        key = self.host_key(url)
+        return bool(key) and self._is_down(key, time.time())
+
+    def down_hosts(self) -> int:
+        """当前判定为宕机的主机数"""
+        now = time.time()
+        return sum(1 for key in self.failures if self._is_down(key, now))
+
+    def reset_sampling(self):
+        """开始新一批测速：重新计数，每个宕机主机在本批中至少放行一个 URL"""
+        self.skipped.clear()
+
+    def should_skip(self, url: str) -> bool:
+        """
+        检查是否应跳过该 URL 的测速。
+
+        主机宕机后，每批测速都放行该主机的第一个 URL，之后按 sample_every 放行少量 URL 继续探测，
+        探测成功则恢复该主机。URL 较少的主机因此每批测速至少有一次恢复的机会。
+
+        :param url: 频道 URL。
+        :return: 需要快速失败时返回 True。
+        """
+        if not self.is_down(url):
+            return False
+        key = self.host_key(url)
+        count = self.skipped.get(key, 0) + 1
+        self.skipped[key] = count
+        if count == 1 or (self.sample_every and (count - 1) % self.sample_every == 0):
+            return False
+        self.fast_failed += 1
+        return True
+
+    def record_failure(self, url: str):
+        """记录一次连接失败或超时"""
+        key = self.host_key(url)
+        if key:
+            now = time.time()
+            # 封顶为阈值：宕机判定只需达到阈值，更高的计数只会拖慢衰减后的恢复
+            self.failures[key] = min(self._decayed(key, now) + 1, self.failure_threshold)
+            self.last_failure[key] = now
+
+    def record_success(self, url: str):
+        """记录一次成功连接，主机恢复健康"""
+        key = self.host_key(url)
+        if key:
+            self.failures.pop(key, None)
+            self.last_failure.pop(key, None)
+
+    def load(self):
+        """从状态文件加载各主机的失败次数和最后一次失败时间，衰减到可以忽略的记录不再加载"""
+        if not self.state_path or not self.state_path.exists():
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"主机健康状态加载失败: {self.state_path} ({str(e)})")
+            return
+
+        now = time.time()
+        saved_at = state.get('saved_at', 0)
+        for key, entry in state.get('hosts', {}).items():
+            # 旧格式只保存失败次数，按保存时间作为最后一次失败时间
+            count, last_failure = entry if isinstance(entry, list) else (entry, saved_at)
+            decay = 0.5 ** (max(now - last_failure, 0) / self.half_life) if self.half_life else 0.0
+            if min(count, self.failure_threshold) * decay >= 0.5:
+                self.failures[key] = min(count, self.failure_threshold)
+                self.last_failure[key] = last_failure
+        self.logger.info(f"已加载主机健康状态: {len(self.failures)} 个异常主机")
+
+    def save(self):
+        """保存失败次数和最后一次失败时间到状态文件"""
+        if not self.state_path:
+            return
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            'saved_at': time.time(),
+            'hosts': {k: [round(v, 3), self.last_failure.get(k, 0)] for k, v in self.failures.items()},
+        }
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        self.logger.info(f"📝 主机健康状态已写入: {self.state_path} (本次快速失败 {self.fast_failed} 个 URL)")
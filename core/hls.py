@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+import asyncio
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+import aiohttp
+
+HLS_CONTENT_TYPES = ('application/vnd.apple.mpegurl', 'application/x-mpegurl', 'audio/mpegurl', 'audio/x-mpegurl')
+
+BANDWIDTH_REGEX = re.compile(r'(?:^|,)BANDWIDTH=(\d+)')
+EXTINF_REGEX = re.compile(r'^#EXTINF:\s*([\d.]+)')
+
+
+@dataclass
+class HLSSample:
+    """HLS 抽样结果"""
+    ok: bool = False
+    realtime_factor: float = 0.0  # 各分片下载耗时 / 该分片时长的最大值，小于 1 表示可以实时播放
+    bitrate: float = 0.0  # 码率（kbps）
+    download_speed: float = 0.0  # 分片下载速度（KB/s）
+    segments: int = 0
+    error: str = ''
+
+
+def is_hls(url: str, content_type: str = '') -> bool:
+    """根据 URL 后缀或响应类型判断是否为 HLS 播放列表"""
+    if content_type.split(';')[0].strip().lower() in HLS_CONTENT_TYPES:
+        return True
+    return urlsplit(url).path.lower().endswith('.m3u8')
+
+
+def parse_master(text: str, base_url: str) -> List[Tuple[int, str]]:
+    """
+    解析主播放列表。
+
+    :return: 结构: [(带宽, 子播放列表 URL), ...]，不是主播放列表时返回空列表。
+    """
+    variants = []
+    bandwidth = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            match = BANDWIDTH_REGEX.search(line[len('#EXT-X-STREAM-INF:'):])
+            bandwidth = int(match.group(1)) if match else 0
+        elif bandwidth is not None and line and not line.startswith('#'):
+            variants.append((bandwidth, urljoin(base_url, line)))
+            bandwidth = None
+    return variants
+
+
+def parse_media(text: str, base_url: str) -> Tuple[List[Tuple[float, str]], bool]:
+    """
+    解析媒体播放列表。
+
+    :return: (结构: [(分片时长, 分片 URL), ...], 是否为直播（无 #EXT-X-ENDLIST）)。
+    """
+    segments = []
+    duration = None
+    for line in text.splitlines():
+        line = line.strip()
+        match = EXTINF_REGEX.match(line)
+        if match:
+            duration = float(match.group(1))
+        elif duration is not None and line and not line.startswith('#'):
+            segments.append((duration, urljoin(base_url, line)))
+            duration = None
+    return segments, '#EXT-X-ENDLIST' not in text
+
+
+class HLSSampler:
+    """HLS 分片抽样器：选择码率、并发下载连续分片，计算实时率和码率"""
+
+    def __init__(self, timeout: float, segment_count: int = 3, byte_cap: int = 2 * 1024 * 1024,
+                 max_realtime_factor: float = 1.0, variant: str = 'lowest'):
+        """
+        初始化 HLS 抽样器。
+
+        :param timeout: 单个请求的超时时间（秒）。
+        :param segment_count: 抽样的连续分片数。
+        :param byte_cap: 每个分片最多下载的字节数（仅对带 Content-Length 的响应生效）。
+        :param max_realtime_factor: 允许的最大实时率，超过则判定无法流畅播放。
+        :param variant: 主播放列表中选择的码率，lowest、highest 或 middle。
+        """
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.segment_count = max(segment_count, 1)
+        self.byte_cap = max(byte_cap, 1)
+        self.max_realtime_factor = max_realtime_factor
+        self.variant = variant
+
+    async def _get_text(self, session: aiohttp.ClientSession, url: str) -> Tuple[str, str]:
+        """获取播放列表文本，返回 (文本, 重定向后的 URL)"""
+        async with session.get(url, timeout=self.timeout) as resp:
+            if resp.status != 200:
+                raise Exception(f"HTTP状态码: {resp.status}")
+            return await resp.text(errors='replace'), str(resp.url)
+
+    def _pick_variant(self, variants: List[Tuple[int, str]]) -> str:
+        ordered = sorted(variants, key=lambda v: v[0])
+        if self.variant == 'highest':
+            return ordered[-1][1]
+        if self.variant == 'middle':
+            return ordered[len(ordered) // 2][1]
+        return ordered[0][1]
+
+    async def _fetch_segment(self, session: aiohttp.ClientSession, url: str) -> Tuple[int, float]:
+        """
+        下载单个分片。响应带 Content-Length 时最多下载 byte_cap 字节并按比例估算完整耗时；
+        长度未知（分块传输）时无法估算，完整下载（仍受超时限制）。
+
+        :return: (分片总字节数, 估算的完整下载耗时)。
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async with session.get(url, timeout=self.timeout) as resp:
+            if resp.status != 200:
+                raise Exception(f"分片 HTTP状态码: {resp.status}")
+            first_byte = loop.time() - start
+            cap = self.byte_cap if resp.content_length else None
+            received = 0
+            async for chunk in resp.content.iter_chunked(64 * 1024):
+                received += len(chunk)
+                if cap and received >= cap:
+                    break
+            total = max(resp.content_length or received, received)
+        # 分片被截断时，只按已下载比例放大传输阶段的耗时，首字节延迟不放大
+        transfer = loop.time() - start - first_byte
+        return total, first_byte + transfer * total / max(received, 1)
+
+    async def sample(self, session: aiohttp.ClientSession, url: str, playlist: Optional[str] = None) -> HLSSample:
+        """
+        抽样检测 HLS 流。
+
+        :param session: aiohttp 会话。
+        :param url: 播放列表 URL。
+        :param playlist: 已获取的播放列表文本，为空时重新获取。
+        :return: 抽样结果。
+        """
+        try:
+            if playlist is None:
+                playlist, url = await self._get_text(session, url)
+
+            variants = parse_master(playlist, url)
+            if variants:
+                playlist, url = await self._get_text(session, self._pick_variant(variants))
+
+            segments, live = parse_media(playlist, url)
+            if not segments:
+                return HLSSample(error="播放列表中没有分片")
+            # 直播取最新的连续分片，点播取开头的连续分片
+            picked = segments[-self.segment_count:] if live else segments[:self.segment_count]
+
+            results = await asyncio.gather(*(self._fetch_segment(session, seg_url) for _, seg_url in picked))
+        except Exception as e:
+            return HLSSample(error=str(e) or type(e).__name__)
+
+        duration = sum(d for d, _ in picked)
+        total = sum(size for size, _ in results)
+        # 每个分片的下载耗时与其自身时长相比，取最差的分片作为实时率
+        realtime_factor = max(t / d if d > 0 else float('inf') for (d, _), (_, t) in zip(picked, results))
+        # 分片并发下载，取最慢分片的耗时作为整体耗时
+        elapsed = max(t for _, t in results)
+        return HLSSample(
+            ok=True,
+            realtime_factor=realtime_factor,
+            bitrate=total * 8 / duration / 1000 if duration > 0 else 0.0,
+            download_speed=(total / 1024) / max(elapsed, 1e-6),
+            segments=len(picked)
+        )
+
+    def is_realtime(self, sample: HLSSample) -> bool:
+        """检查抽样结果是否能支撑实时播放"""
+        return sample.ok and sample.realtime_factor <= self.max_realtime_factor
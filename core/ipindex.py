@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+import ipaddress
+import logging
+import socket
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from .models import Channel
+from .resolver import CachedResolver
+
+IPV4 = frozenset({4})
+IPV6 = frozenset({6})
+UNKNOWN = frozenset()
+
+class AddressFamilyIndex:
+    """地址族索引，记录每个频道 URL 可用的 IP 版本（IPv4/IPv6）"""
+
+    def __init__(self, resolver: Optional[CachedResolver] = None):
+        """
+        初始化地址族索引。
+
+        :param resolver: DNS 缓存解析器，用于查询域名的解析记录类型，为空时使用不持久化的临时解析器。
+        """
+        self.resolver = resolver or CachedResolver()
+        self.url_hosts: Dict[str, str] = {}  # 结构: {URL: 主机名}
+        self.host_families: Dict[str, FrozenSet[int]] = {}  # 结构: {IP 字面量: 地址族}
+        self.logger = logging.getLogger(__name__)
+
+    def add(self, channel: Channel):
+        """解析阶段登记频道 URL，IP 字面量的地址族在此时确定"""
+        if channel.url in self.url_hosts:
+            return
+        host = CachedResolver.hostname(channel.url)
+        self.url_hosts[channel.url] = host
+        if host and host not in self.host_families:
+            try:
+                version = ipaddress.ip_address(host).version
+                self.host_families[host] = IPV4 if version == 4 else IPV6
+            except ValueError:
+                pass  # 域名，地址族在导出前由 resolve 解析
+
+    async def resolve(self, channels: List[Channel]):
+        """
+        解析尚未确定地址族的域名。导出前调用，不依赖测速阶段的预解析
+        （合并分片、从检查点恢复或未启用 DNS 缓存时测速阶段不会解析全部主机）。
+
+        :param channels: 待导出的频道列表。
+        """
+        hosts = set()
+        for chan in channels:
+            self.add(chan)
+            host = self.url_hosts[chan.url]
+            if host and host not in self.host_families:
+                hosts.add(host)
+        if hosts:
+            await self.resolver.prefetch(hosts)
+
+    def families(self, url: str) -> FrozenSet[int]:
+        """
+        查询 URL 可用的地址族。
+
+        域名按 DNS 缓存中的 A/AAAA 记录确定（允许使用已过期的记录）；无法解析或解析超时的域名地址族未知。
+
+        :param url: 频道 URL。
+        :return: 地址族集合，元素为 4 或 6，地址族未知时为空集合。
+        """
+        host = self.url_hosts.get(url)
+        if host is None:
+            self.add(Channel(name='', url=url))
+            host = self.url_hosts[url]
+        known = self.host_families.get(host)
+        if known is not None:
+            return known
+
+        addresses = self.resolver.lookup_cached(host, allow_stale=True) if host else None
+        if not addresses:
+            return UNKNOWN
+        families = frozenset(4 if family == socket.AF_INET else 6 for family, _ in addresses)
+        self.host_families[host] = families
+        return families
+
+    def order(self, channels: List[Channel], prefer: str) -> Tuple[List[Channel], List[Channel], List[Channel]]:
+        """
+        单次遍历完成优先地址族排序和 IPv4/IPv6 拆分。
+
+        优先地址族只在同一分类、同一白名单层级的同名频道之间调整顺序，不会越过白名单优先级。
+        地址族未知的频道保留在排序结果中，但不写入 IPv4/IPv6 列表。
+
+        :param channels: 已按模板排序的频道列表。
+        :param prefer: 优先的 IP 版本，ipv4 或 ipv6，其他值保持原始顺序。
+        :return: (排序后的频道列表, IPv4 频道列表, IPv6 频道列表)。
+        """
+        preferred = {'ipv4': 4, 'ipv6': 6}.get(str(prefer).strip().lower())
+        if preferred is None:
+            # 保持原始顺序，只做拆分
+            groups = {None: ([(chan, self.families(chan.url)) for chan in channels], [])}
+            return self._split(groups)
+
+        # 结构: {(分类, 是否白名单, 频道名称): ([优先地址族频道], [其他频道])}，保持首次出现的顺序
+        groups: Dict[Tuple[str, bool, str], Tuple[list, list]] = {}
+        for chan in channels:
+            families = self.families(chan.url)
+            group = groups.setdefault((chan.category, chan.whitelist_priority > 0, chan.name), ([], []))
+            if preferred in families:
+                group[0].append((chan, families))
+            else:
+                group[1].append((chan, families))
+        return self._split(groups)
+
+    def _split(self, groups: dict) -> Tuple[List[Channel], List[Channel], List[Channel]]:
+        """按分组顺序展开频道，并同时拆分出 IPv4 和 IPv6 频道"""
+        ordered, ipv4_channels, ipv6_channels = [], [], []
+        unknown = 0
+        for first, rest in groups.values():
+            for chan, families in first + rest:
+                ordered.append(chan)
+                if 4 in families:
+                    ipv4_channels.append(chan)
+                if 6 in families:
+                    ipv6_channels.append(chan)
+                if not families:
+                    unknown += 1
+        if unknown:
+            self.logger.warning(f"⚠️ {unknown} 个频道的域名无法解析或解析超时，未写入 IPv4/IPv6 地址文件")
+        return ordered, ipv4_channels, ipv6_channels
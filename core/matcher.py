@@ -1,78 +1,59 @@
 #!/usr/bin/env python3
 import re
-from typing import Dict, List, Set
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 import logging
 from .models import Channel
+from .artifacts import CompiledConfig, compile_templates
+from .normalizer import NameNormalizer
 
 class AutoCategoryMatcher:
     """分类匹配器，支持从模板文件中读取分类规则和多名称映射"""
 
-    def __init__(self, template_path: str):
+    DEFAULT_SUFFIXES = ["高清", "HD", "综合"]
+
+    def __init__(self, template_path: str, compiled: Optional[CompiledConfig] = None,
+                 suffixes: Optional[List[str]] = None):
         """
         初始化分类匹配器。
 
         :param template_path: 模板文件路径。
+        :param compiled: 预编译的模板产物，为空时直接从模板文件编译。
+        :param suffixes: 规范化名称时去除的后缀列表，为空时使用默认后缀。
         """
         self.template_path = template_path
-        self.categories = self._parse_template()
-        self.name_mapping = self._build_name_mapping()
-        self.suffixes = ["高清", "HD", "综合"]  # 可配置的后缀列表
-
-    def _parse_template(self) -> Dict[str, List[re.Pattern]]:
-        """
-        解析模板文件。
-
-        :return: 分类字典，键为分类名称，值为正则表达式列表。
-        """
-        categories = {}
-        current_category = None
-        with open(self.template_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue  # 跳过空行和注释行
-
-                # 检查是否为分类行
-                if line.endswith(',#genre#'):
-                    current_category = line.split(',')[0]
-                    categories[current_category] = []
-                    continue
-
-                # 处理频道名称或正则表达式规则
-                if current_category:
-                    try:
-                        # 将模板中的规则编译为正则表达式
-                        pattern = re.compile(line)
-                        categories[current_category].append(pattern)
-                    except re.error as e:
-                        logging.error(f"正则表达式编译失败: {line} ({str(e)})")
-                        continue  # 跳过无效的正则表达式
-        return categories
-
-    def _build_name_mapping(self) -> Dict[str, str]:
-        """
-        构建名称映射，将模板中的多个名称映射到标准名称。
-
-        :return: 名称映射字典，键为频道名称，值为标准名称。
-        """
-        name_mapping = {}
-        with open(self.template_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue  # 跳过空行和注释行
-
-                # 检查是否为分类行
-                if line.endswith(',#genre#'):
-                    continue
-
-                # 处理频道名称或正则表达式规则
-                parts = line.split('|')
-                if len(parts) > 1:
-                    standard_name = parts[0]  # 第一个名称作为标准名称
-                    for name in parts:
-                        name_mapping[name] = standard_name
-        return name_mapping
+        if compiled is None:
+            compiled = CompiledConfig()
+            compile_templates(Path(template_path), compiled)
+        self.compiled = compiled
+        self.rules = self._compile_rules()
+        self.name_mapping = compiled.name_mapping
+        self.suffixes = suffixes if suffixes is not None else self.DEFAULT_SUFFIXES
+        self.normalizer = NameNormalizer(self.name_mapping, compiled.alias_groups, self.suffixes,
+                                         compiled.literal_names)
+        self._order_patterns: Dict[str, re.Pattern] = {}
+
+    def _compile_rules(self) -> List[Tuple[str, Tuple[str, ...], List[re.Pattern]]]:
+        """
+        编译分类规则，只有含正则元字符的规则需要编译为正则表达式。
+
+        :return: 规则列表，元素为 (分类名称, 字符串规则, 正则规则)。
+        """
+        return [
+            (category, tuple(literals), [re.compile(source) for source in regexes])
+            for category, literals, regexes in self.compiled.rules
+        ]
+
+    def _find_category(self, channel_name: str) -> Optional[str]:
+        """查找第一个匹配频道名称的分类，未匹配时返回 None"""
+        for category, literals, patterns in self.rules:
+            for literal in literals:
+                if literal in channel_name:
+                    return category
+            for pattern in patterns:
+                if pattern.search(channel_name):
+                    return category
+        return None
 
     def match(self, channel_name: str) -> str:
         """
@@ -81,11 +62,8 @@ class AutoCategoryMatcher:
         :param channel_name: 频道名称。
         :return: 匹配的分类名称，如果未匹配则返回 "其他"。
         """
-        for category, patterns in self.categories.items():
-            for pattern in patterns:
-                if pattern.search(channel_name):
-                    return category
-        return "其他"
+        category = self._find_category(channel_name)
+        return category if category is not None else "其他"
 
     def is_in_template(self, channel_name: str) -> bool:
         """
@@ -94,11 +72,7 @@ class AutoCategoryMatcher:
         :param channel_name: 频道名称。
         :return: 如果频道名称匹配模板中的规则，则返回 True，否则返回 False。
         """
-        for patterns in self.categories.values():
-            for pattern in patterns:
-                if pattern.search(channel_name):
-                    return True
-        return False
+        return self._find_category(channel_name) is not None
 
     def normalize_channel_name(self, channel_name: str) -> str:
         """
@@ -107,67 +81,31 @@ class AutoCategoryMatcher:
         :param channel_name: 原始频道名称。
         :return: 规范化后的频道名称。
         """
-        # 去除多余的空格和特殊字符
-        channel_name = channel_name.strip()
-
-        # 如果频道名称中包含后缀，则去掉这些后缀
-        for suffix in self.suffixes:
-            if suffix in channel_name:
-                channel_name = channel_name.replace(suffix, "")
-
-        # 根据模板中的名称映射规范化频道名称
-        if channel_name in self.name_mapping:
-            return self.name_mapping[channel_name]
+        return self.normalizer.normalize(channel_name)
 
-        return channel_name
-
-    def sort_channels_by_template(self, channels: List[Channel], whitelist: Set[str]) -> List[Channel]:
+    def sort_channels_by_template(self, channels: List[Channel]) -> List[Channel]:
         """
         根据模板顺序对频道进行排序，并在每个分类内部优先排序白名单频道。
 
-        :param channels: 频道列表。
-        :param whitelist: 白名单内容。
+        :param channels: 已执行 URL 策略的频道列表（使用 whitelist_priority 判断白名单）。
         :return: 排序后的频道列表。
         """
-        # 解析模板文件，记录每个分类下的频道名称顺序
-        template_order = {}  # 结构: {分类名称: [频道名称列表]}
-        current_category = None
-
-        with open(self.template_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-
-                if line.endswith(',#genre#'):
-                    # 新的分类
-                    current_category = line.split(',')[0]
-                    template_order[current_category] = []
-                elif current_category:
-                    # 当前分类下的频道名称
-                    if '|' in line:
-                        # 处理名称列表（如 "CCTV-1|CCTV综合"）
-                        names = line.split('|')
-                        for name in names:
-                            template_order[current_category].append(name.strip())
-                    else:
-                        # 单个频道名称
-                        template_order[current_category].append(line.strip())
+        template_order = self.compiled.template_order  # 结构: {分类名称: [频道名称列表]}
 
         sorted_channels = []
-        for category, channel_names in template_order.items():
+        for category in template_order:
             # 获取当前分类下的所有频道
             category_channels = [c for c in channels if c.category == category]
 
             # 分离白名单频道和非白名单频道
-            whitelisted = [c for c in category_channels if self._is_whitelisted(c, whitelist)]
-            non_whitelisted = [c for c in category_channels if not self._is_whitelisted(c, whitelist)]
+            whitelisted = [c for c in category_channels if c.whitelist_priority]
+            non_whitelisted = [c for c in category_channels if not c.whitelist_priority]
 
-            # 按照模板中的顺序排序白名单频道
-            whitelisted.sort(key=lambda c: self._get_channel_order(c, channel_names))
+            # 按照模板中的顺序排序白名单频道，顺序相同时白名单优先级高的在前
+            whitelisted.sort(key=lambda c: (self._get_channel_order(c, category), -c.whitelist_priority))
 
             # 按照模板中的顺序排序非白名单频道
-            non_whitelisted.sort(key=lambda c: self._get_channel_order(c, channel_names))
+            non_whitelisted.sort(key=lambda c: self._get_channel_order(c, category))
 
             # 合并白名单和非白名单频道，白名单频道优先
             sorted_category_channels = whitelisted + non_whitelisted
@@ -182,29 +120,29 @@ class AutoCategoryMatcher:
 
         return sorted_channels
 
-    def _is_whitelisted(self, channel, whitelist):
-        """检查频道是否在白名单中"""
-        for entry in whitelist:
-            if entry in channel.url or channel.url == entry or channel.name == entry:
-                return True
-        return False
-
-    def _get_channel_order(self, channel: Channel, channel_names: List[str]) -> int:
+    def _get_channel_order(self, channel: Channel, category: str) -> int:
         """
         获取频道在模板中的顺序。
 
         :param channel: 频道对象。
-        :param channel_names: 模板中定义的频道名称列表。
+        :param category: 频道所属分类。
         :return: 频道在模板中的顺序，未定义的频道返回一个较大的值。
         """
+        channel_count = len(self.compiled.template_order[category])
         try:
             # 使用 normalize_channel_name 方法去除后缀
             clean_name = self.normalize_channel_name(channel.name)
-            # 匹配模板中的频道名称（支持正则表达式）
-            for i, name in enumerate(channel_names):
-                if re.match(f'^{name}$', clean_name):
+            # 普通名称直接查索引，正则名称只需检查排在其前面的规则
+            order = self.compiled.order_index[category].get(clean_name, channel_count)
+            for i, name in self.compiled.order_regex[category]:
+                if i >= order:
+                    break
+                pattern = self._order_patterns.get(name)
+                if pattern is None:
+                    pattern = self._order_patterns[name] = re.compile(f'^{name}$')
+                if pattern.match(clean_name):
                     return i
-            return len(channel_names)  # 未定义的频道放在最后
+            return order
         except Exception as e:
             logging.error(f"Error matching channel name: {channel.name}, error: {e}")
-            return len(channel_names)
\ No newline at end of file
+            return channel_count
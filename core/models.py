@@ -9,4 +9,8 @@ class Channel:
     category: str = "未分类"
     status: str = "pending"
     response_time: float = 0.0
-    download_speed: float = 0.0
\ No newline at end of file
+    download_speed: float = 0.0
+    realtime_factor: float = 0.0  # HLS 分片下载耗时 / 分片时长
+    bitrate: float = 0.0  # HLS 码率（kbps）
+    blocked: bool = False  # 命中黑名单
+    whitelist_priority: int = 0  # 白名单优先级，0 表示不在白名单中
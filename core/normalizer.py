@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+# 折叠时去除的空白和标点（保留 + 等有区分意义的字符，如 CCTV5 与 CCTV5+）
+PUNCTUATION = r"\s\-_·・.,，。:：;；'\"“”‘’()（）\[\]【】<>《》|/\\!！?？*#&~"
+
+class NameNormalizer:
+    """频道名称规范化引擎：全角/半角折叠、大小写折叠、去标点和后缀，再查预计算的别名表"""
+
+    def __init__(self, name_mapping: Dict[str, str], alias_groups: Iterable[List[str]],
+                 suffixes: List[str], literal_names: Iterable[str] = (), cache_size: int = 65536):
+        """
+        初始化名称规范化引擎。
+
+        :param name_mapping: 模板中的精确名称映射，键为频道名称，值为标准名称。
+        :param alias_groups: 模板中的普通名称组，每组第一个名称为标准名称。
+        :param suffixes: 需要去除的后缀列表。
+        :param literal_names: 模板中的所有普通频道名称，去除后缀后命中时原样返回，不做模糊查找。
+        :param cache_size: 原始名称到标准名称的 LRU 缓存大小。
+        """
+        self.name_mapping = name_mapping
+        self.suffixes = [s for s in suffixes if s]
+        # 按长度降序排列，保证较长的后缀优先匹配
+        ordered = sorted(self.suffixes, key=len, reverse=True)
+        self._suffix_re = re.compile('|'.join(re.escape(s) for s in ordered)) if ordered else None
+        folded = sorted({self._fold_text(s) for s in self.suffixes}, key=len, reverse=True)
+        parts = [f'[{PUNCTUATION}]+'] + [re.escape(s) for s in folded if s]
+        self._fold_re = re.compile('|'.join(parts))
+        # 模板名称去除后缀后的形式，与 _normalize 中的 stripped 比较
+        self.literal_names = frozenset(self._strip_suffixes(name) for name in literal_names)
+        self.aliases = self._build_aliases(alias_groups)
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+
+    @staticmethod
+    def _fold_text(text: str) -> str:
+        """全角转半角（NFKC）并做大小写折叠"""
+        return unicodedata.normalize('NFKC', text).casefold()
+
+    def fold(self, name: str) -> str:
+        """
+        生成用于别名查找的折叠键。
+
+        :param name: 频道名称。
+        :return: 去除空白、标点和后缀后的折叠名称。
+        """
+        return self._fold_re.sub('', self._fold_text(name))
+
+    def _strip_suffixes(self, name: str) -> str:
+        """去除后缀和首尾空白"""
+        return self._suffix_re.sub('', name).strip() if self._suffix_re else name.strip()
+
+    def _build_aliases(self, alias_groups: Iterable[List[str]]) -> Dict[str, str]:
+        """
+        由模板名称组生成别名表，键为折叠键，值为标准名称（先出现的优先）。
+
+        标准名称与精确匹配路径的结果一致（去除后缀后再查名称映射），模糊查找不会把已去除的后缀加回来。
+        """
+        aliases = {}
+        for group in alias_groups:
+            standard = self._strip_suffixes(group[0])
+            standard = self.name_mapping.get(standard, standard)
+            for name in group:
+                key = self.fold(name)
+                if key:
+                    aliases.setdefault(key, standard)
+        return aliases
+
+    def _normalize(self, channel_name: str) -> str:
+        """
+        将频道名称规范化为模板中的标准名称。
+
+        :param channel_name: 原始频道名称。
+        :return: 规范化后的频道名称，无法映射时返回去除后缀后的名称。
+        """
+        channel_name = channel_name.strip()
+        stripped = self._strip_suffixes(channel_name)
+
+        # 精确映射优先；本身就是模板名称时原样返回（避免被模糊查找改写为其他模板名称，如 南京新闻 → 南京新闻综合），其次按折叠键查别名表
+        if stripped in self.name_mapping:
+            return self.name_mapping[stripped]
+        if stripped in self.literal_names:
+            return stripped
+        key = self.fold(channel_name)
+        if key in self.aliases:
+            return self.aliases[key]
+        return stripped
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+import logging
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set
+from urllib.parse import urlparse, urlunparse, parse_qs, urlencode, urlsplit
+
+from .models import Channel
+
+# URL 前缀规则的分桶键：协议 + 主机名（不含端口和路径）
+AUTHORITY_REGEX = re.compile(r'^([a-zA-Z][\w+.-]*://(?:\[[^\]/]*\]?|[^/:?#\[]*))')
+# 主机规则：域名、IP 或 [IPv6]，可带端口
+HOST_REGEX = re.compile(r'^(?:\[[0-9a-fA-F:.]+\]|[\w.-]+)(?::\d+)?$', re.ASCII)
+
+
+class RuleIndex:
+    """
+    名单规则索引：URL 前缀按协议和主机分桶后按长度查找，主机规则按域名后缀逐级查找，名称规则精确查找。
+
+    每条规则的优先级由其在名单中的位置决定，越靠前优先级越高。
+    """
+
+    def __init__(self, entries: Iterable[str]):
+        """
+        编译名单规则。
+
+        :param entries: 名单条目：完整 URL 或 URL 前缀、主机（域名/IP，可带端口）或频道名称。
+        """
+        entries = list(entries)
+        # 结构: {协议://主机: {前缀长度: {前缀: 优先级}}}
+        self.prefixes: Dict[str, Dict[int, Dict[str, int]]] = defaultdict(lambda: defaultdict(dict))
+        self.hosts: Dict[str, int] = {}
+        self.names: Dict[str, int] = {}
+        for i, entry in enumerate(entries):
+            priority = len(entries) - i
+            match = AUTHORITY_REGEX.match(entry) if '://' in entry else None
+            if match:
+                self.prefixes[match.group(1)][len(entry)].setdefault(entry, priority)
+                continue
+            if HOST_REGEX.match(entry) and ('.' in entry or ':' in entry):
+                self.hosts.setdefault(entry.lower().replace('[', '').replace(']', ''), priority)
+            # 非 URL 条目同时按频道名称匹配
+            self.names.setdefault(entry, priority)
+        # 转为普通字典，查找时不会意外插入空桶
+        self.prefixes = {key: dict(buckets) for key, buckets in self.prefixes.items()}
+
+    def match_url(self, url: str, host: str, port: Optional[int]) -> int:
+        """
+        查找 URL 命中的最高优先级规则。
+
+        :param url: 清理后的 URL。
+        :param host: 小写主机名。
+        :param port: 端口，URL 未指定时为 None。
+        :return: 命中规则的优先级，未命中时返回 0。
+        """
+        best = 0
+        match = AUTHORITY_REGEX.match(url)
+        buckets = self.prefixes.get(match.group(1)) if match else None
+        if buckets:
+            for length, rules in buckets.items():
+                priority = rules.get(url[:length], 0)
+                if priority > best:
+                    best = priority
+
+        if self.hosts and host:
+            if port is not None:
+                best = max(best, self.hosts.get(f"{host}:{port}", 0))
+            # 域名规则同时匹配其所有子域名
+            labels = host.split('.')
+            for i in range(len(labels)):
+                best = max(best, self.hosts.get('.'.join(labels[i:]), 0))
+        return best
+
+    def match_name(self, name: str) -> int:
+        """查找频道名称命中的规则优先级，未命中时返回 0"""
+        return self.names.get(name, 0)
+
+
+class UrlPolicy:
+    """URL 策略引擎：一次遍历完成 URL 清理、黑名单判定和白名单优先级计算"""
+
+    def __init__(self, remove_params: Iterable[str] = (), blacklist: Iterable[str] = (),
+                 whitelist: Iterable[str] = ()):
+        """
+        初始化 URL 策略引擎。
+
+        :param remove_params: 需要从 URL 中移除的查询参数。
+        :param blacklist: 黑名单条目。
+        :param whitelist: 白名单条目，越靠前优先级越高。
+        """
+        self.params_to_remove: Set[str] = {p.strip() for p in remove_params if p.strip()}
+        self.blacklist = RuleIndex(blacklist)
+        self.whitelist = RuleIndex(whitelist)
+
+    @classmethod
+    def from_config(cls, config, blacklist: Iterable[str] = (), whitelist: Iterable[str] = ()) -> 'UrlPolicy':
+        """由配置文件的 [URL_FILTER] 节和名单内容创建策略引擎"""
+        params = config.get('URL_FILTER', 'remove_params', fallback='') if config else ''
+        return cls(params.split(','), blacklist, whitelist)
+
+    def clean_url(self, raw_url: str) -> str:
+        """清理 URL，去除 $ 及其后面的参数和指定查询参数"""
+        # 先去除 $ 及其后面的参数
+        url = raw_url.split('$')[0].strip()
+
+        # 如果有需要移除的参数，处理查询参数
+        if self.params_to_remove and '?' in url:
+            try:
+                parsed = urlparse(url)
+                if parsed.query:
+                    query_params = parse_qs(parsed.query, keep_blank_values=True)
+                    # 移除指定的参数
+                    filtered_params = {
+                        k: v for k, v in query_params.items()
+                        if k not in self.params_to_remove
+                    }
+                    # 重新构建URL
+                    new_query = urlencode(filtered_params, doseq=True)
+                    url = urlunparse(parsed._replace(query=new_query))
+            except Exception as e:
+                logging.warning(f"URL参数处理失败: {url}, 错误: {str(e)}")
+
+        return url
+
+    def apply(self, channel: Channel) -> Channel:
+        """
+        对频道 URL 执行策略：清理 URL，并按 URL 规则写入黑名单标记和白名单优先级。
+
+        :param channel: 频道对象（url 为原始 URL）。
+        :return: 同一频道对象。
+        """
+        channel.url = self.clean_url(channel.url)
+        try:
+            parts = urlsplit(channel.url)
+            host, port = (parts.hostname or ''), parts.port
+        except ValueError:
+            host, port = '', None
+        channel.blocked = self.blacklist.match_url(channel.url, host, port) > 0
+        channel.whitelist_priority = self.whitelist.match_url(channel.url, host, port)
+        return channel
+
+    def apply_name(self, channel: Channel) -> Channel:
+        """
+        按名称规则更新黑名单标记和白名单优先级，应在名称规范化之后调用。
+
+        :param channel: 已执行过 apply 的频道对象。
+        :return: 同一频道对象。
+        """
+        if self.blacklist.match_name(channel.name):
+            channel.blocked = True
+        channel.whitelist_priority = max(channel.whitelist_priority, self.whitelist.match_name(channel.name))
+        return channel
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+import atexit
+import logging
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+class DeferredQueueHandler(QueueHandler):
+    """只把日志记录放入队列，消息格式化推迟到监听线程中执行"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(level: int = logging.INFO) -> QueueListener:
+    """
+    配置根日志器：调用方只做入队操作，输出由后台监听线程完成。
+
+    :param level: 日志级别。
+    :return: 已启动的队列监听器，进程退出时自动停止。
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+
+    root = logging.getLogger()
+    root.handlers[:] = [DeferredQueueHandler(log_queue)]
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+class StageProgress:
+    """阶段进度显示器：update 只累加计数，由后台定时器按固定间隔刷新终端"""
+
+    def __init__(self, stage_name: str, total: int, refresh_interval: float = 0.5):
+        """
+        初始化进度显示器并启动刷新定时器。
+
+        :param stage_name: 阶段名称。
+        :param total: 总条数。
+        :param refresh_interval: 终端刷新间隔（秒）。
+        """
+        self.stage = stage_name
+        self.total = max(total, 1)
+        self.current = 0
+        self.bar_length = 30
+        self.refresh_interval = refresh_interval
+        self._last_drawn = -1
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"progress-{stage_name}", daemon=True)
+        self._thread.start()
+
+    def update(self, n=1):
+        """累加进度（热路径上只做一次加法）"""
+        self.current += n
+
+    def _draw(self, current: int):
+        current = min(current, self.total)
+        if current == self._last_drawn:
+            return
+        self._last_drawn = current
+        percent = current / self.total * 100
+        filled = int(self.bar_length * current / self.total)
+        bar = '▊' * filled + ' ' * (self.bar_length - filled)
+        sys.stdout.write(f"\r{self.stage} [{bar}] {percent:.1f}%")
+        sys.stdout.flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.refresh_interval):
+            self._draw(self.current)
+
+    def complete(self):
+        self._stopped.set()
+        self._thread.join()
+        bar = '▊' * self.bar_length
+        print(f"\r{self.stage} [{bar}] 100.0%")
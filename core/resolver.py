@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+import asyncio
+import ipaddress
+import json
+import logging
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from aiohttp.abc import AbstractResolver
+
+class CachedResolver(AbstractResolver):
+    """带 TTL 缓存的 DNS 解析器，供 SourceFetcher 与 SpeedTester 的连接器共享，并支持跨运行持久化"""
+
+    def __init__(self, ttl: float = 1800, negative_ttl: float = 3600, concurrency: int = 64,
+                 timeout: float = 5, cache_path: Optional[str] = None, stale_ttl: float = 7 * 86400):
+        """
+        初始化 DNS 解析器。
+
+        :param ttl: 解析成功结果的缓存时间（秒）。订阅源中大量 DDNS 主机会频繁变更地址，不宜过长。
+        :param negative_ttl: 解析失败结果的缓存时间（秒）。
+        :param concurrency: 预解析阶段的最大并发解析数。
+        :param timeout: 单个主机名的解析超时时间（秒），从解析线程开始执行时计时。
+        :param cache_path: 缓存持久化文件路径，为空时不持久化。
+        :param stale_ttl: 解析成功结果过期后继续保留的时间（秒），过期记录只用于判断地址族。
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.concurrency = max(concurrency, 1)
+        self.timeout = timeout
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.stale_ttl = max(stale_ttl, 0)
+        # 结构: {主机名: (过期时间戳, [(地址族, 地址), ...])}，地址列表为空表示无法解析
+        self.cache: Dict[str, Tuple[float, List[Tuple[int, str]]]] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # 专用解析线程池，与并发数一致，避免解析请求在默认线程池中排队时就开始计算超时
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def hostname(url: str) -> str:
+        """提取 URL 中的主机名（小写），无法解析时返回空字符串"""
+        try:
+            return urlsplit(url).hostname or ''
+        except ValueError:
+            return ''
+
+    @staticmethod
+    def is_ip(host: str) -> bool:
+        """检查主机名是否为 IP 字面量"""
+        try:
+            ipaddress.ip_address(host)
+            return True
+        except ValueError:
+            return False
+
+    def lookup_cached(self, host: str, allow_stale: bool = False) -> Optional[List[Tuple[int, str]]]:
+        """
+        查询缓存中的解析结果。
+
+        :param host: 主机名。
+        :param allow_stale: 是否返回已过期的结果（只需判断地址族等不要求最新地址的场景）。
+        :return: 地址列表（空列表表示无法解析），缓存未命中或已过期时返回 None。
+        """
+        entry = self.cache.get(host)
+        if entry is None or (entry[0] < time.time() and not allow_stale):
+            return None
+        return entry[1]
+
+    async def _getaddrinfo(self, host: str) -> Optional[List[Tuple[int, str]]]:
+        """
+        通过系统解析器解析主机名。
+
+        :return: 地址列表；主机名不存在时返回空列表；超时或临时故障时返回 None（结果未知，不缓存）。
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='dns')
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+
+        def lookup():
+            loop.call_soon_threadsafe(lambda: started.done() or started.set_result(None))
+            return socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+
+        async with self._semaphore:
+            try:
+                task = loop.run_in_executor(self._executor, lookup)
+                # 超时从线程开始执行时计算，排队等待空闲线程的时间不计入
+                await asyncio.wait({started, task}, return_when=asyncio.FIRST_COMPLETED)
+                infos = await asyncio.wait_for(task, timeout=self.timeout)
+            except socket.gaierror as e:
+                if e.errno == socket.EAI_AGAIN:
+                    return None  # 临时故障，结果未知
+                return []
+            except UnicodeError:
+                return []  # 主机名无法编码，不可能解析成功
+            except (OSError, asyncio.TimeoutError):
+                return None
+        addresses = []
+        for family, _, _, _, sockaddr in infos:
+            item = (int(family), sockaddr[0])
+            if item not in addresses:
+                addresses.append(item)
+        return addresses
+
+    async def _resolve_host(self, host: str) -> Optional[List[Tuple[int, str]]]:
+        """
+        解析单个主机名，优先使用缓存，并合并同一主机名的并发解析请求。
+
+        :return: 地址列表（空列表表示无法解析），解析超时等结果未知时返回 None。
+        """
+        cached = self.lookup_cached(host)
+        if cached is not None:
+            return cached
+        if host in self._pending:
+            return await self._pending[host]
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[host] = future
+        try:
+            addresses = await self._getaddrinfo(host)
+            if addresses is not None:
+                # 只有确定的结果才写入缓存，超时的主机下次重新解析，并保留旧记录供地址族判断使用
+                ttl = self.ttl if addresses else self.negative_ttl
+                self.cache[host] = (time.time() + ttl, addresses)
+            future.set_result(addresses)
+            return addresses
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._pending[host]
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> List[Dict[str, Any]]:
+        """aiohttp 连接器调用的解析接口"""
+        if self.is_ip(host):
+            addresses = [(socket.AF_INET6 if ':' in host else socket.AF_INET, host)]
+        else:
+            addresses = await self._resolve_host(host.lower()) or []
+        if family:
+            addresses = [a for a in addresses if a[0] == family]
+        if not addresses:
+            raise OSError(f"DNS 解析失败: {host}")
+        return [
+            {
+                'hostname': host,
+                'host': address,
+                'port': port,
+                'family': addr_family,
+                'proto': 0,
+                'flags': socket.AI_NUMERICHOST | socket.AI_NUMERICSERV,
+            }
+            for addr_family, address in addresses
+        ]
+
+    async def close(self):
+        """缓存由调用方管理生命周期，连接器关闭时无需释放资源"""
+        pass
+
+    async def prefetch(self, hosts: Iterable[str]) -> Set[str]:
+        """
+        并发预解析一批主机名，结果写入缓存。
+
+        :param hosts: 主机名列表（可重复，IP 字面量会被跳过）。
+        :return: 无法解析的主机名集合（解析超时的主机结果未知，不包含在内）。
+        """
+        targets = {h.lower() for h in hosts if h and not self.is_ip(h)}
+        if not targets:
+            return set()
+        targets = list(targets)
+        results = await asyncio.gather(*(self._resolve_host(h) for h in targets))
+        unresolvable = {h for h, addresses in zip(targets, results) if addresses == []}
+        unknown = sum(1 for addresses in results if addresses is None)
+        self.logger.info(f"DNS 预解析完成: {len(targets)} 个主机，{len(unresolvable)} 个无法解析，{unknown} 个解析超时")
+        return unresolvable
+
+    def _retained(self, entry: Tuple[float, List[Tuple[int, str]]], now: float) -> bool:
+        """检查缓存记录是否需要保留：未过期的记录，以及仍在 stale_ttl 内的过期成功记录"""
+        expires, addresses = entry
+        return expires >= now or (bool(addresses) and expires + self.stale_ttl >= now)
+
+    def load(self):
+        """从缓存文件加载解析结果（包括仍在 stale_ttl 内的过期成功记录）"""
+        if not self.cache_path or not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"DNS 缓存加载失败: {self.cache_path} ({str(e)})")
+            return
+
+        now = time.time()
+        for host, (expires, addresses) in data.items():
+            if self._retained((expires, addresses), now):
+                self.cache[host] = (expires, [(int(fam), addr) for fam, addr in addresses])
+        self.logger.info(f"已加载 DNS 缓存: {len(self.cache)} 个主机")
+
+    def save(self):
+        """保存解析结果到缓存文件（包括仍在 stale_ttl 内的过期成功记录）"""
+        if not self.cache_path:
+            return
+        now = time.time()
+        data = {host: entry for host, entry in self.cache.items() if self._retained(entry, now)}
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        self.logger.info(f"📝 DNS 缓存已写入: {self.cache_path}")
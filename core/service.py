@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+from aiohttp import web
+
+from .checkpoint import RESULT_FIELDS
+from .fetcher import SourceFetcher
+from .models import Channel
+from .parser import PlaylistParser
+from .tester import SpeedTester
+
+@dataclass
+class SourceState:
+    """订阅源调度状态"""
+    url: str
+    interval: float
+    next_fetch: float = 0.0
+    content_hash: str = ''
+    entries: List[Channel] = field(default_factory=list)  # 解析结果（已执行 URL 策略），重建时复制使用
+    seeded: bool = False  # 是否已有内容或已完成至少一次获取，全部订阅源就绪前不重建频道集合
+
+
+@dataclass
+class ProbeState:
+    """频道测速调度状态"""
+    volatility: float = 0.0  # 状态变化频率的指数滑动平均，取值 0~1
+    last_status: str = 'pending'
+    last_tested: float = 0.0
+    next_due: float = 0.0
+
+
+class IPTVService:
+    """常驻服务：按各自节奏刷新订阅源、滚动复测频道、状态变化时增量导出，并提供本地 HTTP 接口"""
+
+    def __init__(self, config, fetcher: SourceFetcher, parser: PlaylistParser, tester: SpeedTester,
+                 output_dir: str, prepare: Callable[[List[Channel]], List[Channel]],
+                 export: Callable[[List[Channel]], Awaitable[None]]):
+        """
+        初始化常驻服务。
+
+        :param config: 配置对象。
+        :param fetcher: 订阅源获取器。
+        :param parser: 播放列表解析器。
+        :param tester: 测速模块。
+        :param output_dir: 输出目录，HTTP 接口从此目录提供播放列表。
+        :param prepare: 频道预处理函数（分类、过滤、排序、去重）。
+        :param export: 导出协程函数，接收已排序的频道列表并写入所有输出文件。
+        """
+        self.config = config
+        self.fetcher = fetcher
+        self.parser = parser
+        self.tester = tester
+        self.output_dir = Path(output_dir)
+        self.prepare = prepare
+        self.export = export
+
+        self.host = config.get('DAEMON', 'host', fallback='127.0.0.1')
+        self.port = config.getint('DAEMON', 'port', fallback=8080)
+        self.tick = config.getfloat('DAEMON', 'tick', fallback=5)
+        self.fetch_interval_min = config.getfloat('DAEMON', 'fetch_interval_min', fallback=1800)
+        self.fetch_interval_max = config.getfloat('DAEMON', 'fetch_interval_max', fallback=21600)
+        self.probe_interval_min = config.getfloat('DAEMON', 'probe_interval_min', fallback=600)
+        self.probe_interval_max = config.getfloat('DAEMON', 'probe_interval_max', fallback=7200)
+        self.probe_batch_size = config.getint('DAEMON', 'probe_batch_size', fallback=200)
+        self.export_interval = config.getfloat('DAEMON', 'export_interval', fallback=60)
+
+        self.sources: Dict[str, SourceState] = {}
+        self.probes: Dict[str, ProbeState] = {}
+        self.channels: List[Channel] = []
+        self.by_url: Dict[str, Channel] = {}
+        self.dirty = False
+        self.last_export = 0.0
+        self.export_count = 0
+        self.started_at = time.time()
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _digest(content: str) -> str:
+        """计算订阅源内容摘要，用于判断内容是否变化"""
+        return hashlib.sha1(content.encode('utf-8', 'replace')).hexdigest()
+
+    def seed(self, urls: List[str], contents: List[str], channels: List[Channel]):
+        """
+        使用首次完整运行的结果初始化服务状态。
+
+        :param urls: 订阅源 URL 列表。
+        :param contents: 与 urls 一一对应的订阅源内容，从检查点恢复时为空字符串。
+        :param channels: 已测速的频道列表。
+        """
+        now = time.monotonic()
+        for url, content in zip(urls, contents):
+            state = SourceState(url=url, interval=self.fetch_interval_min)
+            if content.strip():
+                state.content_hash = self._digest(content)
+                state.entries = list(self.parser.parse(content))
+                state.seeded = True
+                # 错开各订阅源的刷新时间，避免同时请求
+                state.next_fetch = now + random.uniform(0, state.interval)
+            else:
+                # 没有内容的订阅源立即获取，在此之前保留 channels 作为当前频道集合
+                state.next_fetch = now
+            self.sources[url] = state
+
+        self.channels = channels
+        self.by_url = {c.url: c for c in channels}
+        for chan in channels:
+            # 首轮复测时间均匀分布在最长间隔内
+            self.probes[chan.url] = ProbeState(
+                last_status=chan.status,
+                last_tested=now,
+                next_due=now + random.uniform(0, self.probe_interval_max)
+            )
+
+    @staticmethod
+    def _copy_result(source: Channel, target: Channel):
+        """复制测速结果字段（与检查点保存的字段一致）"""
+        for name in RESULT_FIELDS:
+            setattr(target, name, getattr(source, name))
+
+    def _probe_interval(self, volatility: float) -> float:
+        """根据状态波动程度计算复测间隔，越不稳定的频道复测越频繁"""
+        return self.probe_interval_max - (self.probe_interval_max - self.probe_interval_min) * volatility
+
+    async def _rebuild(self):
+        """订阅源内容变化后重新生成频道集合，保留已有频道的测速结果"""
+        # 复制解析结果，prepare 会就地修改频道名称和分类
+        raw = [replace(c) for state in self.sources.values() for c in state.entries]
+        loop = asyncio.get_running_loop()
+        prepared = await loop.run_in_executor(None, self.prepare, raw)
+
+        now = time.monotonic()
+        probes = {}
+        for chan in prepared:
+            old = self.by_url.get(chan.url)
+            if old is not None:
+                self._copy_result(old, chan)
+                probes[chan.url] = self.probes[chan.url]
+            else:
+                probes[chan.url] = ProbeState(next_due=now)  # 新频道立即测速
+
+        self.logger.info(f"频道集合已更新: {len(prepared)} 个频道 (新增 {len(set(probes) - set(self.probes))})")
+        self.channels = prepared
+        self.by_url = {c.url: c for c in prepared}
+        self.probes = probes
+        self.dirty = True
+
+    async def _source_loop(self, session):
+        """按各订阅源自身的节奏刷新：内容未变化时加倍间隔，变化时恢复最短间隔"""
+        while True:
+            try:
+                now = time.monotonic()
+                due = [s for s in self.sources.values() if s.next_fetch <= now]
+                if due:
+                    contents = await self.fetcher.fetch_all([s.url for s in due], lambda: None, session)
+                    for state, content in zip(due, contents):
+                        # 获取失败的订阅源与首次运行时一样不贡献频道，同样视为就绪
+                        state.seeded = True
+                        if not content.strip():
+                            # 获取失败时保留旧内容，按当前间隔重试
+                            state.next_fetch = now + state.interval
+                            continue
+                        digest = self._digest(content)
+                        if digest != state.content_hash:
+                            state.content_hash = digest
+                            state.entries = list(self.parser.parse(content))
+                            state.interval = self.fetch_interval_min
+                            self.rebuild_pending = True
+                        else:
+                            state.interval = min(state.interval * 2, self.fetch_interval_max)
+                        state.next_fetch = now + state.interval
+                    # 只用部分订阅源重建会丢失其余订阅源的频道，等全部订阅源就绪后再重建
+                    if self.rebuild_pending and all(st.seeded for st in self.sources.values()):
+                        self.rebuild_pending = False
+                        await self._rebuild()
+            except Exception as e:
+                self.logger.error(f"❌ 订阅源刷新失败: {str(e)}")
+            await asyncio.sleep(self.tick)
+
+    async def _probe_loop(self, session):
+        """滚动复测到期频道，状态变化的频道提高波动度并缩短下次复测间隔"""
+        while True:
+            due = []
+            try:
+                now = time.monotonic()
+                due = sorted((p.next_due, url) for url, p in self.probes.items() if p.next_due <= now)
+                batch = [self.by_url[url] for _, url in due[:self.probe_batch_size]]
+                if batch:
+                    await self.tester.test_channels(batch, lambda: None, set(), session)
+                    now = time.monotonic()
+                    for chan in batch:
+                        probe = self.probes.get(chan.url)
+                        if probe is None:
+                            continue  # 测速期间该频道已被移除
+                        current = self.by_url[chan.url]
+                        if current is not chan:
+                            # 测速期间频道集合已重建，同步结果到新对象
+                            self._copy_result(chan, current)
+                        flipped = probe.last_status != 'pending' and chan.status != probe.last_status
+                        if flipped or probe.last_status == 'pending':
+                            self.dirty = True
+                        probe.volatility = 0.7 * probe.volatility + 0.3 * (1.0 if flipped else 0.0)
+                        probe.last_status = chan.status
+                        probe.last_tested = now
+                        probe.next_due = now + self._probe_interval(probe.volatility)
+
+                if self.dirty and time.monotonic() - self.last_export >= self.export_interval:
+                    await self._export()
+            except Exception as e:
+                self.logger.error(f"❌ 滚动复测失败: {str(e)}")
+
+            if len(due) <= self.probe_batch_size:
+                await asyncio.sleep(self.tick)
+
+    async def _export(self):
+        """导出当前频道状态"""
+        await self.export(self.channels)
+        if self.tester.health:
+            self.tester.health.save()
+        if self.fetcher.resolver:
+            self.fetcher.resolver.save()
+        self.dirty = False
+        self.last_export = time.monotonic()
+        self.export_count += 1
+        online = sum(1 for c in self.channels if c.status == 'online')
+        self.logger.info(f"💾 增量导出完成: 在线频道 {online}/{len(self.channels)}")
+
+    def stats(self) -> dict:
+        """服务运行状态统计"""
+        now = time.monotonic()
+        health = self.tester.health
+        return {
+            'uptime': round(time.time() - self.started_at),
+            'sources': len(self.sources),
+            'channels': len(self.channels),
+            'online': sum(1 for c in self.channels if c.status == 'online'),
+            'probes_due': sum(1 for p in self.probes.values() if p.next_due <= now),
+            'volatile_channels': sum(1 for p in self.probes.values() if p.volatility >= 0.3),
+            'exports': self.export_count,
+            'last_export_age': round(now - self.last_export) if self.export_count else None,
+            'hosts_down': health.down_hosts() if health else None,
+        }
+
+    def _playlist_files(self) -> Dict[str, Path]:
+        """可通过 HTTP 接口访问的输出文件"""
+        names = [
+            self.config.get('EXPORTER', 'm3u_filename', fallback='all.m3u'),
+            self.config.get('EXPORTER', 'txt_filename', fallback='all.txt'),
+            self.config.get('PATHS', 'ipv4_output_path', fallback='ipv4.txt'),
+            self.config.get('PATHS', 'ipv6_output_path', fallback='ipv6.txt'),
+        ]
+        return {name: self.output_dir / name for name in names}
+
+    def _create_app(self) -> web.Application:
+        """创建本地 HTTP 接口：/health 返回运行状态，/<文件名> 返回当前播放列表"""
+        files = self._playlist_files()
+
+        async def health(request):
+            return web.json_response(self.stats())
+
+        async def playlist(request):
+            path = files.get(request.match_info['name'])
+            if path is None or not path.exists():
+                raise web.HTTPNotFound()
+            return web.FileResponse(path)
+
+        app = web.Application()
+        app.router.add_get('/health', health)
+        app.router.add_get('/{name}', playlist)
+        return app
+
+    async def run(self):
+        """启动 HTTP 接口与调度循环，直到被取消"""
+        runner = web.AppRunner(self._create_app())
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, self.port)
+        await site.start()
+        self.logger.info(f"🚀 常驻服务已启动: http://{self.host}:{self.port}/health")
+
+        async with self.fetcher.create_session() as fetch_session, \
+                self.tester.create_session() as test_session:
+            try:
+                await asyncio.gather(
+                    self._source_loop(fetch_session),
+                    self._probe_loop(test_session),
+                )
+            finally:
+                if self.tester.health:
+                    self.tester.health.save()
+                if self.fetcher.resolver:
+                    self.fetcher.resolver.save()
+                await runner.cleanup()
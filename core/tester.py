@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
 import asyncio
 import aiohttp
-from typing import List, Callable, Set
+from typing import List, Callable, Set, Optional
 from .models import Channel
+from .health import HostHealthTracker
+from .resolver import CachedResolver
+from .hls import HLSSample, HLSSampler, is_hls
 import logging
 
 class SpeedTester:
     """测速模块"""
 
-    def __init__(self, timeout: float, concurrency: int, max_attempts: int, min_download_speed: float, enable_logging: bool = True):
+    def __init__(self, timeout: float, concurrency: int, max_attempts: int, min_download_speed: float, enable_logging: bool = True,
+                 health: Optional[HostHealthTracker] = None, resolver: Optional[CachedResolver] = None,
+                 hls: Optional[HLSSampler] = None):
         """
         初始化测速模块。
 
@@ -17,27 +22,49 @@ class SpeedTester:
         :param max_attempts: 最大尝试次数。
         :param min_download_speed: 最小下载速度（KB/s）。
         :param enable_logging: 是否启用日志输出。
+        :param health: 主机健康度统计，为空时不做主机级快速失败。
+        :param resolver: 共享的 DNS 缓存解析器，为空时使用 aiohttp 默认解析器。
+        :param hls: HLS 分片抽样器，为空时 m3u8 频道与其他频道一样只检查响应头。
         """
         self.timeout = timeout
         self.semaphore = asyncio.Semaphore(concurrency)
         self.max_attempts = max_attempts
         self.min_download_speed = min_download_speed  # 现在以 KB/s 为单位
         self.enable_logging = enable_logging
+        self.health = health
+        self.resolver = resolver
+        self.hls = hls
         self.logger = logging.getLogger(__name__)
 
-    async def test_channels(self, channels: List[Channel], progress_cb: Callable, failed_urls: Set[str]):
+    def create_session(self) -> aiohttp.ClientSession:
+        """创建使用共享 DNS 缓存的会话，常驻服务模式下可在多轮测速之间复用"""
+        connector = aiohttp.TCPConnector(resolver=self.resolver) if self.resolver else None
+        return aiohttp.ClientSession(connector=connector)
+
+    async def test_channels(self, channels: List[Channel], progress_cb: Callable, failed_urls: Set[str],
+                            session: Optional[aiohttp.ClientSession] = None,
+                            on_result: Optional[Callable[[Channel], None]] = None):
         """
         批量测速。
 
         :param channels: 频道列表。
         :param progress_cb: 进度回调函数，用于通知测速进度。
         :param failed_urls: 用于记录测速失败的 URL。
+        :param session: 复用的 aiohttp 会话，为空时创建临时会话。
+        :param on_result: 单个频道测速完成后的回调函数，用于保存中间结果。
         """
-        async with aiohttp.ClientSession() as session:
-            tasks = [self._test(session, c, progress_cb, failed_urls) for c in channels]
-            await asyncio.gather(*tasks)
-
-    async def _test(self, session: aiohttp.ClientSession, channel: Channel, progress_cb: Callable, failed_urls: Set[str]):
+        if session is None:
+            async with self.create_session() as session:
+                return await self.test_channels(channels, progress_cb, failed_urls, session, on_result)
+
+        if self.health:
+            # 每批测速重新抽样计数，常驻服务模式下宕机主机每批至少放行一个 URL
+            self.health.reset_sampling()
+        tasks = [self._test(session, c, progress_cb, failed_urls, on_result) for c in channels]
+        await asyncio.gather(*tasks)
+
+    async def _test(self, session: aiohttp.ClientSession, channel: Channel, progress_cb: Callable, failed_urls: Set[str],
+                    on_result: Optional[Callable[[Channel], None]] = None):
         """
         测试单个频道。
 
@@ -45,8 +72,20 @@ class SpeedTester:
         :param channel: 频道对象。
         :param progress_cb: 进度回调函数。
         :param failed_urls: 用于记录测速失败的 URL。
+        :param on_result: 测速完成后的回调函数。
         """
         async with self.semaphore:
+            # 所在主机已判定宕机时直接失败，无需等待超时（排队期间主机状态可能已变化，因此在获取信号量后检查）
+            if self.health and self.health.should_skip(channel.url):
+                if self.enable_logging:
+                    self.logger.warning("⚠️ 主机不可用，跳过测速: %s (%s)", channel.name, channel.url)
+                channel.status = 'offline'
+                failed_urls.add(channel.url)
+                if on_result:
+                    on_result(channel)
+                progress_cb()
+                return
+
             for attempt in range(self.max_attempts):
                 try:
                     headers = {'User-Agent': 'Mozilla/5.0'}
@@ -54,20 +93,35 @@ class SpeedTester:
 
                     # 发起请求
                     async with session.get(channel.url, headers=headers, timeout=self.timeout) as resp:
+                        # 收到响应即说明主机可达
+                        if self.health:
+                            self.health.record_success(channel.url)
+
                         # 检查响应状态码
                         if resp.status != 200:
                             if self.enable_logging:
-                                self.logger.warning(f"⚠️ 测速失败 (尝试 {attempt + 1}/{self.max_attempts}): {channel.name} ({channel.url}), 状态码: {resp.status}")
+                                self.logger.warning("⚠️ 测速失败 (尝试 %d/%d): %s (%s), 状态码: %s",
+                                                    attempt + 1, self.max_attempts, channel.name, channel.url, resp.status)
                             if attempt == self.max_attempts - 1:
                                 channel.status = 'offline'
                                 failed_urls.add(channel.url)
                             continue
 
+                        # HLS 播放列表：抽样下载分片，按实时率判断能否流畅播放
+                        if self.hls and is_hls(channel.url, resp.headers.get('Content-Type', '')):
+                            playlist = await resp.text(errors='replace')
+                            channel.response_time = asyncio.get_event_loop().time() - start
+                            if self._apply_hls(channel, await self.hls.sample(session, str(resp.url), playlist),
+                                               attempt, failed_urls):
+                                break
+                            continue
+
                         # 检查响应体是否为空
                         content_length = int(resp.headers.get('Content-Length', 0))
                         if content_length <= 0:
                             if self.enable_logging:
-                                self.logger.warning(f"⚠️ 测速失败 (尝试 {attempt + 1}/{self.max_attempts}): {channel.name} ({channel.url}), 响应体为空")
+                                self.logger.warning("⚠️ 测速失败 (尝试 %d/%d): %s (%s), 响应体为空",
+                                                    attempt + 1, self.max_attempts, channel.name, channel.url)
                             if attempt == self.max_attempts - 1:
                                 channel.status = 'offline'
                                 failed_urls.add(channel.url)
@@ -81,9 +135,11 @@ class SpeedTester:
 
                         if self.enable_logging:
                             if download_speed < self.min_download_speed:  
-                                self.logger.warning(f"⚠️ 测速失败 (尝试 {attempt + 1}/{self.max_attempts}): {channel.name} ({channel.url}), 下载速度: {download_speed:.2f} KB/s (低于 {self.min_download_speed:.2f} KB/s)")
+                                self.logger.warning("⚠️ 测速失败 (尝试 %d/%d): %s (%s), 下载速度: %.2f KB/s (低于 %.2f KB/s)",
+                                                    attempt + 1, self.max_attempts, channel.name, channel.url,
+                                                    download_speed, self.min_download_speed)
                             else:
-                                self.logger.info(f"✅ 测速成功: {channel.name} ({channel.url}), 下载速度: {download_speed:.2f} KB/s")
+                                self.logger.info("✅ 测速成功: %s (%s), 下载速度: %.2f KB/s", channel.name, channel.url, download_speed)
 
                         if download_speed < self.min_download_speed:  # 直接使用 KB/s 单位进行比较
                             channel.status = 'offline'
@@ -94,14 +150,26 @@ class SpeedTester:
                         break
 
                 except asyncio.TimeoutError:
+                    if self.health:
+                        self.health.record_failure(channel.url)
                     if self.enable_logging:
-                        self.logger.error(f"❌ 测速超时 (尝试 {attempt + 1}/{self.max_attempts}): {channel.name} ({channel.url})")
+                        self.logger.error("❌ 测速超时 (尝试 %d/%d): %s (%s)", attempt + 1, self.max_attempts, channel.name, channel.url)
+                    if attempt == self.max_attempts - 1:
+                        channel.status = 'offline'
+                        failed_urls.add(channel.url)
+                except aiohttp.ClientConnectorError as e:
+                    if self.health:
+                        self.health.record_failure(channel.url)
+                    if self.enable_logging:
+                        self.logger.error("❌ 连接失败 (尝试 %d/%d): %s (%s), 错误: %s",
+                                          attempt + 1, self.max_attempts, channel.name, channel.url, e)
                     if attempt == self.max_attempts - 1:
                         channel.status = 'offline'
                         failed_urls.add(channel.url)
                 except Exception as e:
                     if self.enable_logging:
-                        self.logger.error(f"❌ 测速异常 (尝试 {attempt + 1}/{self.max_attempts}): {channel.name} ({channel.url}), 错误: {str(e)}")
+                        self.logger.error("❌ 测速异常 (尝试 %d/%d): %s (%s), 错误: %s",
+                                          attempt + 1, self.max_attempts, channel.name, channel.url, e)
                     if attempt == self.max_attempts - 1:
                         channel.status = 'offline'
                         failed_urls.add(channel.url)
@@ -109,5 +177,45 @@ class SpeedTester:
                 # 每次尝试后等待 1 秒
                 await asyncio.sleep(1)
 
+            if on_result:
+                on_result(channel)
+
             # 更新进度条
-            progress_cb()
\ No newline at end of file
+            progress_cb()
+
+    def _apply_hls(self, channel: Channel, sample: HLSSample, attempt: int, failed_urls: Set[str]) -> bool:
+        """
+        根据 HLS 抽样结果更新频道状态。
+
+        :param channel: 频道对象。
+        :param sample: HLS 抽样结果。
+        :param attempt: 当前尝试次数（从 0 开始）。
+        :param failed_urls: 用于记录测速失败的 URL。
+        :return: 是否得到了有效结果（抽样失败时返回 False 以便重试）。
+        """
+        if not sample.ok:
+            if self.enable_logging:
+                self.logger.warning("⚠️ HLS 抽样失败 (尝试 %d/%d): %s (%s), 错误: %s",
+                                    attempt + 1, self.max_attempts, channel.name, channel.url, sample.error)
+            if attempt == self.max_attempts - 1:
+                channel.status = 'offline'
+                failed_urls.add(channel.url)
+            return False
+
+        channel.realtime_factor = sample.realtime_factor
+        channel.bitrate = sample.bitrate
+        channel.download_speed = sample.download_speed
+
+        if self.hls.is_realtime(sample):
+            channel.status = 'online'
+            if self.enable_logging:
+                self.logger.info("✅ 测速成功: %s (%s), 实时率: %.2f, 码率: %.0f kbps",
+                                 channel.name, channel.url, sample.realtime_factor, sample.bitrate)
+        else:
+            channel.status = 'offline'
+            failed_urls.add(channel.url)
+            if self.enable_logging:
+                self.logger.warning("⚠️ 测速失败: %s (%s), 实时率: %.2f (高于 %.2f), 码率: %.0f kbps",
+                                    channel.name, channel.url, sample.realtime_factor,
+                                    self.hls.max_realtime_factor, sample.bitrate)
+        return True
@@ -1,96 +1,80 @@
 #!/usr/bin/env python3
 import os
+import argparse
 import asyncio
 import configparser
 from pathlib import Path
 from typing import List, Set
-import re
 import logging
 from core import (
     SourceFetcher,
     PlaylistParser,
     AutoCategoryMatcher,
     SpeedTester,
-    ResultExporter
+    ResultExporter,
+    HostHealthTracker,
+    CachedResolver,
+    HLSSampler,
+    IPTVService,
+    AddressFamilyIndex,
+    CheckpointStore,
+    load_compiled_config,
+    shard_of,
+    StageProgress,
+    UrlPolicy,
+    setup_logging
 )
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class StageProgress:
-    """阶段进度显示器"""
-    
-    def __init__(self, stage_name: str, total: int, update_interval: int = 10):
-        self.stage = stage_name
-        self.total = max(total, 1)
-        self.current = 0
-        self.bar_length = 30
-        self.update_interval = update_interval
-
-    def update(self, n=1):
-        self.current = min(self.current + n, self.total)
-        if self.current % self.update_interval == 0 or self.current == self.total:
-            percent = self.current / self.total * 100
-            filled = int(self.bar_length * self.current / self.total)
-            bar = '▊' * filled + ' ' * (self.bar_length - filled)
-            print(f"\r{self.stage} [{bar}] {percent:.1f}%", end='', flush=True)
-
-    def complete(self):
-        bar = '▊' * self.bar_length
-        print(f"\r{self.stage} [{bar}] 100.0%")
-
-
-def is_blacklisted(channel, blacklist):
-    """检查频道是否在黑名单中"""
-    for entry in blacklist:
-        if entry in channel.url or channel.url == entry or channel.name == entry:
-            return True
-    return False
-
-
-def classify_and_write_ips(channels: List['Channel'], config, output_dir: Path, matcher, whitelist):
+def prepare_channels(channels: List['Channel'], matcher, policy, progress_cb=None) -> List['Channel']:
+    """
+    规范化并分类频道，过滤模板外和黑名单频道，按模板排序后按 URL 去重。
+
+    :param channels: 解析得到的频道列表（解析时已执行 URL 策略）。
+    :param matcher: 分类匹配器。
+    :param policy: URL 策略引擎，用于按规范化后的名称补充黑白名单判定。
+    :param progress_cb: 进度回调函数，每分类一个频道调用一次。
+    :return: 待测速的频道列表。
+    """
+    for chan in channels:
+        chan.name = matcher.normalize_channel_name(chan.name)
+        chan.category = matcher.match(chan.name)
+        policy.apply_name(chan)
+        if progress_cb:
+            progress_cb()
+
+    # 过滤频道：仅保留模板中定义的频道
+    filtered_channels = [chan for chan in channels if matcher.is_in_template(chan.name)]
+    logger.info(f"过滤后频道数量: {len(filtered_channels)}/{len(channels)}")
+
+    # 过滤黑名单
+    filtered_channels = [chan for chan in filtered_channels if not chan.blocked]
+    logger.info(f"过滤黑名单后频道数量: {len(filtered_channels)}")
+
+    # 按模板排序并优先白名单频道
+    sorted_channels = matcher.sort_channels_by_template(filtered_channels)
+
+    unique_channels = []
+    seen_urls = set()
+    for chan in sorted_channels:
+        if chan.url not in seen_urls:
+            unique_channels.append(chan)
+            seen_urls.add(chan.url)
+    logger.info(f"去重后频道数量: {len(unique_channels)}/{len(sorted_channels)}")
+    return unique_channels
+
+
+def write_grouped_channels(channels: List['Channel'], path: Path):
     """
-    分类 IPv4 和 IPv6 地址，并将结果写入文件。
+    按分类写入频道列表。
     文件格式：
     分类名称,#genre#
     频道名称,URL
     """
-    # 从配置文件中读取 update_interval_classify
-    update_interval = config.getint('PROGRESS', 'update_interval_classify', fallback=10000)
-
-    # 创建进度条
-    progress = StageProgress("🏷️ 分类频道", len(channels), update_interval=update_interval)
-
-    # 首先对频道按照模板顺序进行排序
-    sorted_channels = matcher.sort_channels_by_template(channels, whitelist)
-
-    ipv4_channels = []
-    ipv6_channels = []
-
-    # 正则表达式匹配 IPv4 和 IPv6 地址
-    ipv4_pattern = re.compile(r'http://\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}')
-    ipv6_pattern = re.compile(r'http://\[[a-fA-F0-9:]+]')
-
-    # 统计每个分类的频道数量
-    category_counts = {}
-    for channel in sorted_channels:
-        if ipv4_pattern.search(channel.url):
-            ipv4_channels.append(channel)
-            category_counts[channel.category] = category_counts.get(channel.category, 0) + 1
-        elif ipv6_pattern.search(channel.url):
-            ipv6_channels.append(channel)
-            category_counts[channel.category] = category_counts.get(channel.category, 0) + 1
-
-        # 更新进度条
-        progress.update()
-
-    progress.complete()
-
-    # 写入 IPv4 地址
-    ipv4_output_path = Path(config.get('PATHS', 'ipv4_output_path', fallback='ipv4.txt'))
-    with open(output_dir / ipv4_output_path, 'w', encoding='utf-8') as f:
+    with open(path, 'w', encoding='utf-8') as f:
         current_category = None
-        for channel in ipv4_channels:
+        for channel in channels:
             # 如果分类发生变化，写入分类行
             if channel.category != current_category:
                 if current_category is not None:
@@ -99,21 +83,29 @@ def classify_and_write_ips(channels: List['Channel'], config, output_dir: Path,
                 current_category = channel.category
             # 写入频道信息
             f.write(f"{channel.name},{channel.url}\n")
+
+
+async def export_results(channels: List['Channel'], exporter, ip_index, config, output_dir: Path, progress_cb):
+    """
+    导出 M3U/TXT/CSV 以及 IPv4、IPv6 地址文件。
+
+    频道已按模板排序，导出前先解析全部频道主机的地址族，
+    再由地址族索引在一次遍历中完成 prefer_ip_version 排序和 IPv4/IPv6 拆分。
+    """
+    await ip_index.resolve(channels)
+    prefer_ip_version = config.get('MAIN', 'prefer_ip_version', fallback='1')
+    ordered, ipv4_channels, ipv6_channels = ip_index.order(channels, prefer_ip_version)
+
+    exporter.export(ordered, progress_cb, presorted=True)
+
+    # 写入 IPv4 地址
+    ipv4_output_path = Path(config.get('PATHS', 'ipv4_output_path', fallback='ipv4.txt'))
+    write_grouped_channels(ipv4_channels, output_dir / ipv4_output_path)
     logger.info(f"📝 IPv4 地址已写入: {output_dir / ipv4_output_path}")
 
     # 写入 IPv6 地址
     ipv6_output_path = Path(config.get('PATHS', 'ipv6_output_path', fallback='ipv6.txt'))
-    with open(output_dir / ipv6_output_path, 'w', encoding='utf-8') as f:
-        current_category = None
-        for channel in ipv6_channels:
-            # 如果分类发生变化，写入分类行
-            if channel.category != current_category:
-                if current_category is not None:
-                    f.write("\n")  # 在分类之间添加空行
-                f.write(f"{channel.category},#genre#\n")
-                current_category = channel.category
-            # 写入频道信息
-            f.write(f"{channel.name},{channel.url}\n")
+    write_grouped_channels(ipv6_channels, output_dir / ipv6_output_path)
     logger.info(f"📝 IPv6 地址已写入: {output_dir / ipv6_output_path}")
 
 
@@ -130,8 +122,26 @@ def write_failed_urls(failed_urls: Set[str], config):
     logger.info(f"📝 测速失败的 URL 已写入: {failed_urls_path}")
 
 
-async def main():
-    """主工作流程"""
+def parse_shard(value: str):
+    """解析 --shard 参数，格式为 I/N"""
+    try:
+        index, count = (int(x) for x in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"分片格式应为 I/N: {value}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"分片序号超出范围: {value}")
+    return index, count
+
+
+async def main(daemon: bool = False, resume: bool = False, shard=None, merge: bool = False):
+    """
+    主工作流程。
+
+    :param daemon: 完成首次运行后是否进入常驻服务模式。
+    :param resume: 是否从检查点恢复（最后完成的阶段和已测速的 URL）。
+    :param shard: 分片参数 (分片序号, 分片总数)，为空时测试全部 URL。
+    :param merge: 是否只合并各分片的测速结果并导出。
+    """
     try:
         # 初始化配置
         config = configparser.ConfigParser()
@@ -155,28 +165,53 @@ async def main():
         tester_min_download_speed = float(config.get('TESTER', 'min_download_speed', fallback=0.01))
         tester_enable_logging = config.getboolean('TESTER', 'enable_logging', fallback=False)
 
+        # 读取 HEALTH 配置
+        health = None
+        if config.getboolean('HEALTH', 'enable', fallback=True):
+            health = HostHealthTracker(
+                failure_threshold=config.getint('HEALTH', 'failure_threshold', fallback=3),
+                sample_every=config.getint('HEALTH', 'sample_every', fallback=20),
+                half_life_hours=config.getfloat('HEALTH', 'half_life_hours', fallback=24.0),
+                state_path=config.get('HEALTH', 'state_path', fallback='.cache/host_health.json')
+            )
+            health.load()
+
+        # 读取 DNS 配置
+        resolver = None
+        if config.getboolean('DNS', 'enable', fallback=True):
+            resolver = CachedResolver(
+                ttl=config.getfloat('DNS', 'ttl', fallback=1800),
+                negative_ttl=config.getfloat('DNS', 'negative_ttl', fallback=3600),
+                concurrency=config.getint('DNS', 'concurrency', fallback=64),
+                timeout=config.getfloat('DNS', 'timeout', fallback=5),
+                cache_path=config.get('DNS', 'cache_path', fallback='.cache/dns_cache.json'),
+                stale_ttl=config.getfloat('DNS', 'stale_ttl', fallback=604800)
+            )
+            resolver.load()
+
+        # 读取 HLS 配置
+        hls = None
+        if config.getboolean('HLS', 'enable', fallback=True):
+            hls = HLSSampler(
+                timeout=tester_timeout,
+                segment_count=config.getint('HLS', 'segment_count', fallback=3),
+                byte_cap=config.getint('HLS', 'byte_cap_kb', fallback=2048) * 1024,
+                max_realtime_factor=config.getfloat('HLS', 'max_realtime_factor', fallback=1.0),
+                variant=config.get('HLS', 'variant', fallback='lowest')
+            )
+
+        # 读取 PROGRESS 配置
+        progress_refresh = config.getfloat('PROGRESS', 'refresh_interval', fallback=0.5)
+
         # 读取 EXPORTER 配置
         enable_history = config.getboolean('EXPORTER', 'enable_history', fallback=False)
 
-        # 读取 BLACKLIST 配置
-        blacklist_path = Path(config.get('BLACKLIST', 'blacklist_path', fallback='config/blacklist.txt'))
-        if blacklist_path.exists():
-            with open(blacklist_path, 'r', encoding='utf-8') as f:
-                blacklist = set(line.strip() for line in f if line.strip() and not line.startswith('#'))
-        else:
-            blacklist = set()
-
-        # 读取 WHITELIST 配置
-        whitelist_path = Path(config.get('WHITELIST', 'whitelist_path', fallback='config/whitelist.txt'))
-        if whitelist_path.exists():
-            with open(whitelist_path, 'r', encoding='utf-8') as f:
-                whitelist = set(line.strip() for line in f if line.strip() and not line.startswith('#'))
-        else:
-            whitelist = set()
-
         # 读取 PATHS 配置
         urls_path = Path(config.get('PATHS', 'urls_path', fallback='config/urls.txt'))
         templates_path = Path(config.get('PATHS', 'templates_path', fallback='config/templates.txt'))
+        artifact_path = config.get('PATHS', 'artifact_path', fallback='.cache/compiled_config.json')
+        blacklist_path = config.get('BLACKLIST', 'blacklist_path', fallback='config/blacklist.txt')
+        whitelist_path = config.get('WHITELIST', 'whitelist_path', fallback='config/whitelist.txt')
 
         # 检查文件是否存在
         if not urls_path.exists():
@@ -184,70 +219,148 @@ async def main():
         if not templates_path.exists():
             raise FileNotFoundError(f"❌ 缺少分类模板文件: {templates_path}")
 
-        # 阶段1: 获取订阅源
+        # 加载模板、黑名单和白名单的预编译产物（源文件变化时自动重新编译）
+        compiled = load_compiled_config(str(templates_path), blacklist_path, whitelist_path, artifact_path)
+        # 将 remove_params、黑名单和白名单编译为统一的 URL 策略，每个 URL 只在解析时评估一次
+        policy = UrlPolicy.from_config(config, compiled.blacklist, compiled.whitelist)
+
+        # 检查点：支持从最后完成的阶段恢复，以及按 URL 分片测速
+        checkpoints = CheckpointStore(
+            config.get('CHECKPOINT', 'dir', fallback='checkpoints'),
+            flush_every=config.getint('CHECKPOINT', 'flush_every', fallback=200)
+        )
+        resume = resume or merge
+        if shard and not resume:
+            checkpoints.clear_results(shard[0])  # 同一目录中可能有其他分片的结果，只清理本分片
+        elif not resume:
+            checkpoints.clear()
+        if shard:
+            checkpoints.save_shard_count(shard[1])
+
         with open(urls_path, 'r', encoding='utf-8') as f:
             urls = [line.strip() for line in f if line.strip()]
-        
+
         fetcher = SourceFetcher(
             timeout=fetcher_timeout,
-            concurrency=fetcher_concurrency
+            concurrency=fetcher_concurrency,
+            resolver=resolver
         )
-        progress = StageProgress("🌐 获取源数据", len(urls), update_interval=10)
-        contents = await fetcher.fetch_all(urls, progress.update)
-        progress.complete()
-
-        # 阶段2: 解析频道
-        parser = PlaylistParser(config)
-        valid_contents = [c for c in contents if c.strip()]
-        progress = StageProgress("🔍 解析频道", len(valid_contents), update_interval=20)
-        channels = []
-        for content in valid_contents:
-            channels.extend(parser.parse(content))
-            progress.update()
-        progress.complete()
-
-        # 阶段3: 智能分类
-        matcher = AutoCategoryMatcher(str(templates_path))
-        progress = StageProgress("🏷️ 分类频道", len(channels), update_interval=50)
-        for chan in channels:
-            chan.name = matcher.normalize_channel_name(chan.name)
-            chan.category = matcher.match(chan.name)
-            progress.update()
-        progress.complete()
-
-        # 过滤频道：仅保留模板中定义的频道
-        filtered_channels = [chan for chan in channels if matcher.is_in_template(chan.name)]
-        logger.info(f"过滤后频道数量: {len(filtered_channels)}/{len(channels)}")
-
-        # 过滤黑名单
-        filtered_channels = [chan for chan in filtered_channels if not is_blacklisted(chan, blacklist)]
-        logger.info(f"过滤黑名单后频道数量: {len(filtered_channels)}")
-
-        # 按模板排序并优先白名单频道
-        sorted_channels = matcher.sort_channels_by_template(filtered_channels, whitelist)  # 修正：添加 whitelist 参数
+        parser = PlaylistParser(config, policy)
+        suffixes = [s.strip() for s in config.get('MATCHER', 'suffixes', fallback='高清,HD,综合').split(',')]
+        matcher = AutoCategoryMatcher(str(templates_path), compiled, suffixes)
+        ip_index = AddressFamilyIndex(resolver)
+        contents = [''] * len(urls)  # 从检查点恢复时没有订阅源内容，常驻服务会立即获取全部订阅源后再重建频道集合
+
+        unique_channels = checkpoints.load_channels('prepared') if resume else None
+        if merge and unique_channels is None:
+            # 重新获取订阅源会得到与各分片不同的频道集合，不能用于合并
+            raise FileNotFoundError(f"❌ 缺少 prepared 检查点，无法合并分片结果: {checkpoints.directory}")
+        if unique_channels is None:
+            channels = checkpoints.load_channels('parsed') if resume else None
+            if channels is None:
+                # 阶段1: 获取订阅源
+                progress = StageProgress("🌐 获取源数据", len(urls), refresh_interval=progress_refresh)
+                contents = await fetcher.fetch_all(urls, progress.update)
+                progress.complete()
+
+                # 阶段2: 解析频道
+                valid_contents = [c for c in contents if c.strip()]
+                progress = StageProgress("🔍 解析频道", len(valid_contents), refresh_interval=progress_refresh)
+                channels = []
+                for content in valid_contents:
+                    for chan in parser.parse(content):
+                        ip_index.add(chan)
+                        channels.append(chan)
+                    progress.update()
+                progress.complete()
+                checkpoints.save_channels('parsed', channels)
+
+            # 阶段3: 智能分类
+            progress = StageProgress("🏷️ 分类频道", len(channels), refresh_interval=progress_refresh)
+            unique_channels = prepare_channels(channels, matcher, policy, progress.update)
+            progress.complete()
+            checkpoints.save_channels('prepared', unique_channels)
+
+        if resume:
+            for chan in unique_channels:
+                ip_index.add(chan)
 
         # 阶段4: 测速测试
-        unique_channels = []
-        seen_urls = set()
-        for chan in sorted_channels:
-            if chan.url not in seen_urls:
-                unique_channels.append(chan)
-                seen_urls.add(chan.url)
-        logger.info(f"去重后频道数量: {len(unique_channels)}/{len(sorted_channels)}")
+        # 分片运行时只测试属于本分片的 URL
+        test_channels = unique_channels
+        if shard:
+            shard_index, shard_count = shard
+            test_channels = [c for c in unique_channels if shard_of(c.url, shard_count) == shard_index]
+            logger.info(f"分片 {shard_index}/{shard_count}: {len(test_channels)}/{len(unique_channels)} 个频道")
+
+        # 恢复已完成的测速结果
+        failed_urls = set()
+        if resume:
+            results = checkpoints.load_results()
+            remaining = []
+            for chan in test_channels:
+                result = results.get(chan.url)
+                if result is None:
+                    remaining.append(chan)
+                    continue
+                checkpoints.apply_result(chan, result)
+                if chan.status != 'online':
+                    failed_urls.add(chan.url)
+            if merge:
+                missing_shards = checkpoints.missing_shards()
+                if missing_shards:
+                    raise FileNotFoundError(f"❌ 缺少分片测速结果: {', '.join(map(str, missing_shards))}")
+                if remaining:
+                    raise RuntimeError(f"❌ {len(remaining)} 个频道没有测速结果，请先用 --shard I/N --resume 补测未完成的分片")
+                test_channels = []
+            else:
+                test_channels = remaining
+
+        result_writer = checkpoints.result_writer(shard[0] if shard else None)
+
+        # DNS 预解析：无法解析的主机直接判定为离线，不再发起测速请求
+        if resolver and test_channels:
+            unresolvable = await resolver.prefetch(CachedResolver.hostname(c.url) for c in test_channels)
+            if unresolvable:
+                resolved_channels = []
+                for chan in test_channels:
+                    if CachedResolver.hostname(chan.url) in unresolvable:
+                        chan.status = 'offline'
+                        failed_urls.add(chan.url)
+                        result_writer.record(chan)
+                    else:
+                        resolved_channels.append(chan)
+                logger.info(f"DNS 解析失败频道数量: {len(test_channels) - len(resolved_channels)}")
+                test_channels = resolved_channels
+            resolver.save()
 
         tester = SpeedTester(
             timeout=tester_timeout,
             concurrency=tester_concurrency,
             max_attempts=tester_max_attempts,
             min_download_speed=tester_min_download_speed,
-            enable_logging=tester_enable_logging
+            enable_logging=tester_enable_logging,
+            health=health,
+            resolver=resolver,
+            hls=hls
         )
-        progress = StageProgress("⏱️ 测速测试", len(unique_channels), update_interval=100)
-        failed_urls = set()
-        await tester.test_channels(unique_channels, progress.update, failed_urls)
+        progress = StageProgress("⏱️ 测速测试", len(test_channels), refresh_interval=progress_refresh)
+        try:
+            await tester.test_channels(test_channels, progress.update, failed_urls, on_result=result_writer.record)
+        finally:
+            result_writer.close()
         progress.complete()
         logger.info("测速测试完成")
 
+        # 保存主机健康状态
+        if health:
+            health.save()
+
+        # 分片运行到此结束，由 --merge 合并各分片结果后导出
+        if shard:
+            logger.info(f"✅ 分片 {shard[0]}/{shard[1]} 测速完成，结果已写入: {checkpoints.directory}")
+            return
+
         # 写入失败的 URL
         if failed_urls:
             write_failed_urls(failed_urls, config)
@@ -260,12 +373,11 @@ async def main():
             config=config,
             matcher=matcher  # 添加 matcher 参数
         )
-        progress = StageProgress("💾 导出结果", 2, update_interval=1)
-        exporter.export(unique_channels, progress.update)
+        progress = StageProgress("💾 导出结果", 2, refresh_interval=progress_refresh)
+        await export_results(unique_channels, exporter, ip_index, config, output_dir, progress.update)
         progress.complete()
-
-        # 分类并写入 IPv4 和 IPv6 地址
-        classify_and_write_ips(unique_channels, config, output_dir, matcher, whitelist)
+        if resolver:
+            resolver.save()
 
         # 输出生成的文件路径
         m3u_filename = config.get('EXPORTER', 'm3u_filename', fallback='all.m3u')
@@ -283,6 +395,30 @@ async def main():
         logger.info(f"✅ 任务完成！在线频道: {online}/{len(unique_channels)}")
         logger.info(f"📂 输出目录: {output_dir.resolve()}")
 
+        # 完整运行结束，清理检查点
+        checkpoints.clear()
+
+        # 常驻服务模式：保留内存中的频道、匹配器和连接池，持续增量刷新
+        if daemon:
+            daemon_exporter = ResultExporter(
+                output_dir=str(output_dir),
+                enable_history=False,  # 增量导出不生成历史记录
+                template_path=str(templates_path),
+                config=config,
+                matcher=matcher
+            )
+            service = IPTVService(
+                config=config,
+                fetcher=fetcher,
+                parser=parser,
+                tester=tester,
+                output_dir=str(output_dir),
+                prepare=lambda raw: prepare_channels(raw, matcher, policy),
+                export=lambda chans: export_results(chans, daemon_exporter, ip_index, config, output_dir, lambda n=1: None)
+            )
+            service.seed(urls, contents, unique_channels)
+            await service.run()
+
     except Exception as e:
         logger.error(f"❌ 发生错误: {str(e)}")
         logger.info("💡 排查建议:")
@@ -291,11 +427,20 @@ async def main():
         logger.info("3. 验证分类模板格式是否正确")
 
 if __name__ == "__main__":
+    setup_logging(logging.INFO)
+
     if os.name == 'nt':
         from asyncio import WindowsSelectorEventLoopPolicy
         asyncio.set_event_loop_policy(WindowsSelectorEventLoopPolicy())
     
+    arg_parser = argparse.ArgumentParser(description="IPTV 频道管理工具")
+    arg_parser.add_argument('--daemon', action='store_true', help="完成首次运行后进入常驻服务模式")
+    arg_parser.add_argument('--resume', action='store_true', help="从检查点恢复上次中断的运行")
+    arg_parser.add_argument('--shard', type=parse_shard, metavar='I/N', help="只测试第 I 个分片（共 N 个，I 从 0 开始）")
+    arg_parser.add_argument('--merge', action='store_true', help="合并检查点目录中各分片的测速结果并导出")
+    args = arg_parser.parse_args()
+
     try:
-        asyncio.run(main())
+        asyncio.run(main(daemon=args.daemon, resume=args.resume, shard=args.shard, merge=args.merge))
     except Exception as e:
         logger.error(f"❌ 全局异常捕获: {str(e)}")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import codecs
+import gzip
+
+from core.decoder import SAMPLE_SIZE, StreamDecoder, detect_encoding
+
+TEXT = '央视频道,#genre#\nCCTV1综合,http://example.com/cctv1.m3u8\n湖南卫视,http://example.com/hunan.m3u8\n'
+
+
+def decode(data: bytes, declared=None, chunk_size: int = 1000) -> StreamDecoder:
+    decoder = StreamDecoder(declared)
+    for i in range(0, len(data), chunk_size):
+        decoder.feed(data[i:i + chunk_size])
+    decoder.text = decoder.finish()
+    return decoder
+
+
+def test_bom():
+    assert decode(codecs.BOM_UTF8 + TEXT.encode('utf-8')).text == TEXT
+    assert decode(TEXT.encode('utf-16')).text == TEXT
+
+
+def test_gbk_without_declared_charset():
+    decoder = decode(TEXT.encode('gbk'))
+    assert decoder.encoding == 'gb18030'
+    assert decoder.text == TEXT
+
+
+def test_headerless_gzip():
+    # .m3u.gz 文件未声明 Content-Encoding，按 gzip 魔数识别并流式解压
+    body = TEXT * (SAMPLE_SIZE // len(TEXT.encode('utf-8')) + 10)
+    decoder = decode(gzip.compress(body.encode('utf-8')))
+    assert decoder.encoding == 'utf-8'
+    assert decoder.text == body
+
+
+def test_bogus_declared_charset():
+    # 服务器默认声明 ISO-8859-1，实际内容为 UTF-8 或 GBK
+    assert detect_encoding(TEXT.encode('utf-8'), 'iso-8859-1') == 'utf-8'
+    assert detect_encoding(TEXT.encode('gbk'), 'ISO-8859-1') == 'gb18030'
+    assert decode(TEXT.encode('utf-8'), 'iso-8859-1').text == TEXT
+    # 不存在的编码名称
+    assert detect_encoding(TEXT.encode('utf-8'), 'x-no-such-charset') == 'utf-8'
+
+
+def test_declared_charset_is_still_used():
+    # 声明的多字节编码优先于 UTF-8 校验，单字节编码在内容无法按 UTF-8/GBK 解码时采用
+    assert detect_encoding(TEXT.encode('big5', errors='ignore'), 'big5') == 'big5'
+    assert detect_encoding('café au lait'.encode('cp1252'), 'cp1252') == 'cp1252'
+    assert detect_encoding('café au lait'.encode('cp1252')) == 'latin-1'
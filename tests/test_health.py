@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+import json
+from typing import Tuple
+
+from core import health as health_module
+from core.health import HostHealthTracker
+
+URL = 'http://relay.example.com:8080/{}.m3u8'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+def make_tracker(monkeypatch, **kwargs) -> Tuple[HostHealthTracker, FakeClock]:
+    clock = FakeClock()
+    monkeypatch.setattr(health_module.time, 'time', clock.time)
+    return HostHealthTracker(failure_threshold=3, half_life_hours=1, **kwargs), clock
+
+
+def test_down_host_recovers_without_restart(monkeypatch):
+    tracker, clock = make_tracker(monkeypatch)
+    for _ in range(5):
+        tracker.record_failure(URL.format(0))
+    assert tracker.is_down(URL.format(0)) and tracker.down_hosts() == 1
+
+    # 常驻服务模式下不会重新 load，宕机判定在最后一次失败后一个半衰期内自动解除
+    clock.now += 1800
+    assert tracker.is_down(URL.format(0))
+    clock.now += 1800
+    assert not tracker.is_down(URL.format(0)) and tracker.down_hosts() == 0
+
+    # 衰减后的失败次数约为 1.5，再失败一次不会立即重新判定为宕机
+    tracker.record_failure(URL.format(0))
+    assert not tracker.is_down(URL.format(0))
+
+
+def test_each_batch_releases_first_url(monkeypatch):
+    tracker, _ = make_tracker(monkeypatch, sample_every=0)
+    for _ in range(3):
+        tracker.record_failure(URL.format(0))
+
+    for _ in range(2):
+        tracker.reset_sampling()
+        assert not tracker.should_skip(URL.format(1))
+        assert tracker.should_skip(URL.format(2))
+        assert tracker.should_skip(URL.format(3))
+
+
+def test_load_legacy_state(tmp_path, monkeypatch):
+    tracker, clock = make_tracker(monkeypatch, state_path=str(tmp_path / 'host_health.json'))
+    (tmp_path / 'host_health.json').write_text(json.dumps({
+        'saved_at': clock.now - 3600,
+        'hosts': {'relay.example.com:8080': 8, 'fresh.example.com:80': 3},
+    }))
+    tracker.load()
+    # 旧格式按保存时间衰减：封顶为 3 后衰减一个半衰期为 1.5，不再判定为宕机
+    assert tracker.failures['relay.example.com:8080'] == 3
+    assert not tracker.is_down(URL.format(0))
+
+    tracker.save()
+    state = json.loads((tmp_path / 'host_health.json').read_text())
+    assert state['hosts']['relay.example.com:8080'] == [3, clock.now - 3600]
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+import asyncio
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from core.hls import HLSSampler
+
+CHUNK = 32 * 1024
+
+
+def media_playlist(count: int, duration: float, prefix: str = '', endlist: bool = False) -> str:
+    lines = ['#EXTM3U', f'#EXT-X-TARGETDURATION:{duration:g}']
+    for i in range(count):
+        lines += [f'#EXTINF:{duration:g},', f'{prefix}seg{i}.ts']
+    if endlist:
+        lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
+
+
+def make_app(requested: list, segment_delay: float = 0.0) -> web.Application:
+    """本地替身服务器：记录请求路径，分片响应可按参数延迟"""
+
+    async def master(request):
+        requested.append(request.path)
+        return web.Response(text='#EXTM3U\n'
+                                 '#EXT-X-STREAM-INF:BANDWIDTH=3000000\nhigh/index.m3u8\n'
+                                 '#EXT-X-STREAM-INF:BANDWIDTH=800000\nlow/index.m3u8\n',
+                            content_type='application/vnd.apple.mpegurl')
+
+    async def live(request):
+        requested.append(request.path)
+        return web.Response(text=media_playlist(6, 2.0))
+
+    async def vod(request):
+        requested.append(request.path)
+        return web.Response(text=media_playlist(6, 2.0, endlist=True))
+
+    async def slow(request):
+        requested.append(request.path)
+        return web.Response(text=media_playlist(3, 0.5, prefix='/slow/', endlist=True))
+
+    async def segment(request):
+        requested.append(request.path)
+        if segment_delay:
+            await asyncio.sleep(segment_delay)
+        return web.Response(body=b'x' * (4 * CHUNK))
+
+    async def trickle(request):
+        """声明 Content-Length，分块缓慢发送：前 2 块用时约 0.3 秒，全部 4 块约 0.9 秒"""
+        requested.append(request.path)
+        resp = web.StreamResponse()
+        resp.content_length = 4 * CHUNK
+        await resp.prepare(request)
+        for i in range(4):
+            await resp.write(b'x' * CHUNK)
+            await asyncio.sleep(0.3)
+        return resp
+
+    async def chunked(request):
+        """分块传输，不声明 Content-Length"""
+        requested.append(request.path)
+        resp = web.StreamResponse()
+        resp.enable_chunked_encoding()
+        await resp.prepare(request)
+        for i in range(4):
+            await resp.write(b'x' * CHUNK)
+            await asyncio.sleep(0.05)
+        return resp
+
+    async def chunked_playlist(request):
+        requested.append(request.path)
+        return web.Response(text=media_playlist(1, 1.0, prefix='/chunked/', endlist=True))
+
+    app = web.Application()
+    app.router.add_get('/chunked.m3u8', chunked_playlist)
+    app.router.add_get('/chunked/{name}.ts', chunked)
+    app.router.add_get('/master.m3u8', master)
+    app.router.add_get('/{variant}/index.m3u8', live)
+    app.router.add_get('/vod.m3u8', vod)
+    app.router.add_get('/slow.m3u8', slow)
+    app.router.add_get('/slow/{name}.ts', trickle)
+    app.router.add_get('/{name}.ts', segment)
+    app.router.add_get('/{variant}/{name}.ts', segment)
+    return app
+
+
+def run_sample(sampler: HLSSampler, path: str, segment_delay: float = 0.0):
+    requested = []
+
+    async def main():
+        async with TestServer(make_app(requested, segment_delay)) as server:
+            async with aiohttp.ClientSession() as session:
+                return await sampler.sample(session, str(server.make_url(path)))
+
+    return asyncio.run(main()), requested
+
+
+def test_master_playlist_selects_variant():
+    sample, requested = run_sample(HLSSampler(timeout=5, segment_count=1, variant='lowest'), '/master.m3u8')
+    assert sample.ok
+    assert '/low/index.m3u8' in requested and '/high/index.m3u8' not in requested
+
+    sample, requested = run_sample(HLSSampler(timeout=5, segment_count=1, variant='highest'), '/master.m3u8')
+    assert sample.ok
+    assert '/high/index.m3u8' in requested and '/low/index.m3u8' not in requested
+
+
+def test_live_playlist_samples_latest_segments():
+    sample, requested = run_sample(HLSSampler(timeout=5, segment_count=2), '/low/index.m3u8')
+    assert sample.ok and sample.segments == 2
+    assert sorted(p for p in requested if p.endswith('.ts')) == ['/low/seg4.ts', '/low/seg5.ts']
+
+
+def test_vod_playlist_samples_first_segments():
+    sample, requested = run_sample(HLSSampler(timeout=5, segment_count=2), '/vod.m3u8')
+    assert sample.ok
+    assert sorted(p for p in requested if p.endswith('.ts')) == ['/seg0.ts', '/seg1.ts']
+
+
+def test_byte_cap_extrapolates_transfer_time():
+    # 只下载一半（约 0.3 秒），按 Content-Length 估算完整耗时约 0.6 秒以上，超过 0.5 秒的分片时长
+    sampler = HLSSampler(timeout=5, segment_count=3, byte_cap=2 * CHUNK)
+    sample, _ = run_sample(sampler, '/slow.m3u8')
+    assert sample.ok
+    assert sample.realtime_factor > 1.0
+    assert not sampler.is_realtime(sample)
+    # 码率按完整分片大小计算，而不是截断后的字节数
+    assert abs(sample.bitrate - 4 * CHUNK * 8 / 0.5 / 1000) < 1e-6
+
+
+def test_unknown_length_is_downloaded_in_full():
+    # 长度未知时无法按比例估算，byte_cap 不生效，码率按完整分片计算
+    sample, _ = run_sample(HLSSampler(timeout=5, segment_count=1, byte_cap=CHUNK), '/chunked.m3u8')
+    assert sample.ok
+    assert abs(sample.bitrate - 4 * CHUNK * 8 / 1.0 / 1000) < 1e-6
+
+
+def test_realtime_threshold_uses_each_segment_duration():
+    sampler = HLSSampler(timeout=5, segment_count=3, max_realtime_factor=1.0)
+    sample, _ = run_sample(sampler, '/vod.m3u8')
+    assert sample.ok and sampler.is_realtime(sample)
+
+    # 每个 2 秒的分片都要 3 秒才能下载完：按单个分片计算实时率约 1.5，不能因为并发下载而被摊薄
+    sample, _ = run_sample(sampler, '/vod.m3u8', segment_delay=3.0)
+    assert sample.ok
+    assert sample.realtime_factor > 1.0
+    assert not sampler.is_realtime(sample)
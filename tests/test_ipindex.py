@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+import asyncio
+import socket
+import time
+
+from core.ipindex import AddressFamilyIndex
+from core.models import Channel
+from core.resolver import CachedResolver
+
+
+def fake_getaddrinfo(host, port, *args, **kwargs):
+    """替身系统解析器：v4. 开头的主机只有 A 记录，v6. 开头的只有 AAAA 记录"""
+    if host.startswith('v4.'):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('192.0.2.1', 0))]
+    if host.startswith('v6.'):
+        return [(socket.AF_INET6, socket.SOCK_STREAM, 6, '', ('2001:db8::1', 0, 0, 0))]
+    raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+
+
+CHANNELS = [
+    Channel(name='A', url='http://v4.example.com/a.m3u8', category='央视'),
+    Channel(name='A', url='http://v6.example.com/a.m3u8', category='央视'),
+    Channel(name='B', url='http://[2001:db8::2]:8080/b.m3u8', category='央视'),
+]
+
+
+def split(index: AddressFamilyIndex):
+    asyncio.run(index.resolve(CHANNELS))
+    _, ipv4, ipv6 = index.order(CHANNELS, 'ipv4')
+    return [c.url for c in ipv4], [c.url for c in ipv6]
+
+
+def test_domains_are_resolved_without_prefetch(monkeypatch):
+    # 测速阶段没有预解析（合并分片、从检查点恢复）时，导出前仍会解析域名
+    monkeypatch.setattr(socket, 'getaddrinfo', fake_getaddrinfo)
+    ipv4, ipv6 = split(AddressFamilyIndex(CachedResolver()))
+    assert ipv4 == ['http://v4.example.com/a.m3u8']
+    assert ipv6 == ['http://v6.example.com/a.m3u8', 'http://[2001:db8::2]:8080/b.m3u8']
+
+
+def test_domains_are_resolved_without_dns_cache(monkeypatch):
+    # 未启用 DNS 缓存时使用临时解析器
+    monkeypatch.setattr(socket, 'getaddrinfo', fake_getaddrinfo)
+    ipv4, ipv6 = split(AddressFamilyIndex(None))
+    assert ipv4 == ['http://v4.example.com/a.m3u8']
+    assert ipv6 == ['http://v6.example.com/a.m3u8', 'http://[2001:db8::2]:8080/b.m3u8']
+
+
+def test_expired_families_survive_restart(tmp_path, monkeypatch):
+    # 地址过期后重新解析超时：仍按上次已知的地址族拆分
+    cache_path = tmp_path / 'dns_cache.json'
+    resolver = CachedResolver(cache_path=str(cache_path))
+    resolver.cache['v4.example.com'] = (time.time() - 3600, [(socket.AF_INET, '192.0.2.1')])
+    resolver.save()
+
+    def timeout(*args, **kwargs):
+        raise socket.gaierror(socket.EAI_AGAIN, 'Temporary failure in name resolution')
+
+    monkeypatch.setattr(socket, 'getaddrinfo', timeout)
+    restarted = CachedResolver(cache_path=str(cache_path))
+    restarted.load()
+    index = AddressFamilyIndex(restarted)
+    asyncio.run(index.resolve(CHANNELS[:1]))
+    assert index.families(CHANNELS[0].url) == frozenset({4})
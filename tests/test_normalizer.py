@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+from core.artifacts import CompiledConfig, compile_templates
+from core.normalizer import NameNormalizer
+
+SUFFIXES = ['高清', 'HD', '综合']
+
+TEMPLATE = """\
+江苏综合,#genre#
+南京新闻综合
+南京新闻
+汶川新闻综合
+汶川新闻
+河南｜周口扶沟
+河南周口扶沟
+CCTV6,http://example.com:8080/cctv6.m3u8
+CCTV5|CCTV-5
+"""
+
+
+def build_normalizer(tmp_path) -> NameNormalizer:
+    template = tmp_path / 'templates.txt'
+    template.write_text(TEMPLATE, encoding='utf-8')
+    compiled = CompiledConfig()
+    compile_templates(template, compiled)
+    return NameNormalizer(compiled.name_mapping, compiled.alias_groups, SUFFIXES, compiled.literal_names)
+
+
+def test_literal_template_names_are_not_rewritten(tmp_path):
+    normalizer = build_normalizer(tmp_path)
+    assert normalizer.normalize('南京新闻') == '南京新闻'
+    assert normalizer.normalize('汶川新闻') == '汶川新闻'
+    assert normalizer.normalize('河南周口扶沟') == '河南周口扶沟'
+    assert normalizer.normalize('河南｜周口扶沟') == '河南｜周口扶沟'
+
+
+def test_suffixes_are_stripped_without_trailing_space(tmp_path):
+    normalizer = build_normalizer(tmp_path)
+    assert normalizer.normalize('南京新闻综合') == '南京新闻'
+    assert normalizer.normalize('南京新闻 高清') == '南京新闻'
+
+
+def test_fuzzy_lookup_never_adds_suffixes_back(tmp_path):
+    normalizer = build_normalizer(tmp_path)
+    # 模板中两种写法都存在时，折叠键相同的名称也不会被改写成带后缀的写法
+    assert normalizer.normalize('南京 新闻') == '南京新闻'
+
+
+def test_name_url_lines_are_folded_into_aliases(tmp_path):
+    normalizer = build_normalizer(tmp_path)
+    assert normalizer.normalize('CCTV6 高清') == 'CCTV6'
+    assert normalizer.normalize('CCTV-6综合 HD') == 'CCTV6'
+    assert normalizer.normalize('ＣＣＴＶ６') == 'CCTV6'
+
+
+def test_mapping_and_unknown_names(tmp_path):
+    normalizer = build_normalizer(tmp_path)
+    assert normalizer.normalize('CCTV-5') == 'CCTV5'
+    assert normalizer.normalize('cctv 5 高清') == 'CCTV5'
+    assert normalizer.normalize('未知频道') == '未知频道'
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+from core.models import Channel
+from core.policy import UrlPolicy
+
+
+def apply(policy: UrlPolicy, url: str, name: str = 'CCTV1') -> Channel:
+    return policy.apply_name(policy.apply(Channel(name=name, url=url)))
+
+
+def test_url_prefix_does_not_match_similar_host():
+    policy = UrlPolicy(blacklist=['http://110.7.131.4:9901'])
+    assert apply(policy, 'http://110.7.131.4:9901/tsfile/live/0001_1.m3u8').blocked
+    # 旧的子串匹配会把 .40 误判为 .4 的前缀
+    assert not apply(policy, 'http://110.7.131.40:9901/tsfile/live/0001_1.m3u8').blocked
+    assert not apply(policy, 'https://110.7.131.4:9901/tsfile/live/0001_1.m3u8').blocked
+
+
+def test_host_entry_matches_subdomains():
+    policy = UrlPolicy(blacklist=['example.com'])
+    assert apply(policy, 'http://example.com/live.m3u8').blocked
+    assert apply(policy, 'http://live.cdn.example.com:8080/live.m3u8').blocked
+    assert apply(policy, 'rtmp://EXAMPLE.com/live').blocked
+    assert not apply(policy, 'http://badexample.com/live.m3u8').blocked
+    assert not apply(policy, 'http://example.com.cn/live.m3u8').blocked
+
+
+def test_host_port_entry():
+    policy = UrlPolicy(blacklist=['110.7.131.4:9901', '[2001:db8::1]:8080'])
+    assert apply(policy, 'http://110.7.131.4:9901/a.m3u8').blocked
+    assert not apply(policy, 'http://110.7.131.4:9902/a.m3u8').blocked
+    assert not apply(policy, 'http://110.7.131.40:9901/a.m3u8').blocked
+    assert apply(policy, 'http://[2001:db8::1]:8080/a.m3u8').blocked
+    assert not apply(policy, 'http://[2001:db8::1]:8081/a.m3u8').blocked
+
+
+def test_name_entries_apply_after_normalization():
+    policy = UrlPolicy(blacklist=['购物频道'], whitelist=['CCTV1'])
+    # 名称规则不影响 URL 阶段的判定，只在 apply_name 中按规范化后的名称匹配
+    chan = policy.apply(Channel(name='购物频道', url='http://example.com/a.m3u8'))
+    assert not chan.blocked
+    assert policy.apply_name(chan).blocked
+
+    chan = policy.apply(Channel(name='CCTV1', url='http://example.com/b.m3u8'))
+    assert chan.whitelist_priority == 0
+    assert policy.apply_name(chan).whitelist_priority > 0
+    assert not apply(policy, 'http://example.com/c.m3u8', name='CCTV2').whitelist_priority
+
+
+def test_whitelist_priority_follows_list_order():
+    policy = UrlPolicy(whitelist=[
+        'http://first.example.com/live/',
+        'second.example.com',
+        'http://first.example.com/',
+        'CCTV5',
+    ])
+    top = apply(policy, 'http://first.example.com/live/cctv1.m3u8')
+    host = apply(policy, 'http://cdn.second.example.com/cctv1.m3u8')
+    prefix = apply(policy, 'http://first.example.com/other/cctv1.m3u8')
+    name = apply(policy, 'http://other.example.com/cctv5.m3u8', name='CCTV5')
+    assert top.whitelist_priority > host.whitelist_priority > prefix.whitelist_priority > name.whitelist_priority > 0
+    # 同时命中多条规则时取最高优先级
+    both = apply(policy, 'http://first.example.com/live/cctv5.m3u8', name='CCTV5')
+    assert both.whitelist_priority == top.whitelist_priority
+
+
+def test_remove_params_before_matching():
+    policy = UrlPolicy(remove_params=['token'], blacklist=['http://example.com/a.m3u8?id=1'])
+    chan = apply(policy, 'http://example.com/a.m3u8?id=1&token=abc$备用')
+    assert chan.url == 'http://example.com/a.m3u8?id=1'
+    assert chan.blocked
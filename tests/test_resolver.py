@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+import asyncio
+import socket
+import time
+
+from core.resolver import CachedResolver
+
+
+def slow_getaddrinfo(delay: float):
+    """替身系统解析器：每次解析耗时 delay 秒，nx- 开头的主机名不存在"""
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        if host.startswith('nx-'):
+            raise socket.gaierror(socket.EAI_NONAME, 'Name or service not known')
+        time.sleep(delay)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('192.0.2.1', 0))]
+
+    return getaddrinfo
+
+
+def test_queued_lookups_do_not_time_out(monkeypatch):
+    # 并发数远大于默认线程池：排队时间不计入超时，慢但有效的主机不会被判定为无法解析
+    monkeypatch.setattr(socket, 'getaddrinfo', slow_getaddrinfo(0.2))
+    resolver = CachedResolver(concurrency=64, timeout=0.5)
+    hosts = [f"host{i}.example.com" for i in range(200)]
+    unresolvable = asyncio.run(resolver.prefetch(hosts))
+    assert unresolvable == set()
+    assert all(resolver.lookup_cached(h) for h in hosts)
+
+
+def test_timeouts_are_not_negative_cached(monkeypatch):
+    monkeypatch.setattr(socket, 'getaddrinfo', slow_getaddrinfo(0.3))
+    resolver = CachedResolver(concurrency=4, timeout=0.1)
+    unresolvable = asyncio.run(resolver.prefetch(['slow.example.com', 'nx-missing.example.com']))
+    # 超时的主机结果未知，不判定为无法解析，也不写入缓存
+    assert unresolvable == {'nx-missing.example.com'}
+    assert resolver.lookup_cached('slow.example.com') is None
+
+
+def test_nxdomain_is_negative_cached(monkeypatch):
+    monkeypatch.setattr(socket, 'getaddrinfo', slow_getaddrinfo(0.0))
+    resolver = CachedResolver()
+    assert asyncio.run(resolver.prefetch(['nx-missing.example.com'])) == {'nx-missing.example.com'}
+    assert resolver.lookup_cached('nx-missing.example.com') == []